@@ -4,6 +4,7 @@ Manages all environment variables and settings.
 """
 
 import os
+import re
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -13,6 +14,14 @@ load_dotenv()
 # API KEYS
 # =============================================================================
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Attempts for OpenAI calls that hit rate limits or connection errors
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "6"))
+# Connection pool size of the shared OpenAI HTTP client
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "32"))
+# Embedding throughput quota (tokens / requests per minute); 0 disables throttling
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "0"))
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "0"))
 
 # =============================================================================
 # MONGODB CONFIGURATION
@@ -20,7 +29,19 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MONGODB_URI = os.getenv("MONGODB_URI")
 MONGODB_DATABASE = os.getenv("MONGODB_DATABASE", "yuno_rag")
 MONGODB_COLLECTION = os.getenv("MONGODB_COLLECTION", "documents")
+# Materialized counters (total, per type/team/provider) maintained on ingest
+MONGODB_STATS_COLLECTION = os.getenv("MONGODB_STATS_COLLECTION", "stats")
+# Connection pool size and wire compression (zstd needs the zstandard package;
+# unavailable compressors are skipped)
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "32"))
+MONGODB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "zstd,zlib")
 VECTOR_INDEX_NAME = os.getenv("VECTOR_INDEX_NAME", "vector_index")
+# Atlas index-side vector quantization: "scalar" (int8), "binary" or "none"
+VECTOR_INDEX_QUANTIZATION = os.getenv("VECTOR_INDEX_QUANTIZATION", "scalar")
+# How embeddings are stored in documents: "float" (array of doubles),
+# "float32" (BSON float32 vector, 2x smaller) or "int8" (BSON int8 vector with a
+# per-vector scale, 8x smaller). Changing it requires re-ingesting with --clear.
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float")
 
 # =============================================================================
 # CHUNKING CONFIGURATION
@@ -31,19 +52,104 @@ VECTOR_INDEX_NAME = os.getenv("VECTOR_INDEX_NAME", "vector_index")
 # Reference: RAG Cookbook (Anthropic), Section 2.1 - Chunk Size Tuning
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1500"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "300"))
+# "recursive" (LangChain) or "rust" (semantic-text-splitter, much faster on
+# large corpora; pip install semantic-text-splitter)
+TEXT_SPLITTER = os.getenv("TEXT_SPLITTER", "recursive")
+
+# =============================================================================
+# INGESTION CONFIGURATION
+# =============================================================================
+# Chunks are embedded in sub-batches capped by count and by total tokens
+# (the OpenAI embeddings endpoint rejects requests above 300k tokens)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "96"))
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "250000"))
+# Device for local sentence-transformers embeddings (cuda, mps, cpu);
+# unset lets sentence-transformers pick. Accelerators run the model in FP16.
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE") or None
+# Maximum OpenAI embedding sub-batch requests in flight at once (process-wide)
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "10"))
+# PDF text extraction backend: "pypdf" or "pymupdf" (C-level text extraction
+# that skips graphics operators; pip install pymupdf)
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pypdf")
+# Chunks buffered per document before they are embedded and written
+INGEST_FLUSH_CHUNKS = int(os.getenv("INGEST_FLUSH_CHUNKS", "256"))
+# Leading characters of a document scanned for Jira/Confluence header fields
+# (the provider LLM call only sees the first page)
+METADATA_HEAD_CHARS = int(os.getenv("METADATA_HEAD_CHARS", "8000"))
+# PDFs processed concurrently (ingestion is mostly waiting on the embeddings API)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "8"))
 
 # =============================================================================
 # RETRIEVAL CONFIGURATION
 # =============================================================================
 TOP_K = int(os.getenv("TOP_K", "5"))
+# Adaptive top_k: short factoid queries retrieve fewer documents, multi-hop /
+# comparison queries retrieve more (see ResponseGenerator.query)
+FACTOID_TOP_K = int(os.getenv("FACTOID_TOP_K", "3"))
+FACTOID_MAX_WORDS = int(os.getenv("FACTOID_MAX_WORDS", "5"))
+MULTI_HOP_TOP_K = int(os.getenv("MULTI_HOP_TOP_K", "10"))
 SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.7"))
+# $vectorSearch numCandidates = NUM_CANDIDATES_FACTOR x limit, kept within
+# [MIN_NUM_CANDIDATES, 10000] (Atlas recommends 10-20x the limit)
+NUM_CANDIDATES_FACTOR = int(os.getenv("NUM_CANDIDATES_FACTOR", "10"))
+MIN_NUM_CANDIDATES = int(os.getenv("MIN_NUM_CANDIDATES", "100"))
+# Token budget for the retrieved context packed into the generation prompt
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "6000"))
+# Retrieved chunks whose SimHash fingerprints differ by at most this many bits
+# are treated as duplicates and sent to the model only once
+DEDUP_MAX_HAMMING_DISTANCE = int(os.getenv("DEDUP_MAX_HAMMING_DISTANCE", "3"))
+# Seconds that team/provider counts are reused before re-querying MongoDB
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "60"))
+# Query embeddings kept in memory (LRU) so repeated queries skip the embeddings API
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
+# =============================================================================
+# SEMANTIC CACHE CONFIGURATION
+# =============================================================================
+# Answers are reused for identical or near-identical (cosine >= threshold) queries
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_DIR = os.getenv("SEMANTIC_CACHE_DIR", ".semantic_cache")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Maximum cached answers per embedding model; the oldest are evicted first
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+# Seconds a cached answer stays valid (0 = no expiry)
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
 
 # =============================================================================
 # MODEL CONFIGURATION
 # =============================================================================
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+# Shortened OpenAI embeddings (text-embedding-3 models are Matryoshka-trained,
+# e.g. 512 instead of 1536); 0 keeps the model's full size. Changing it
+# requires re-ingesting with --clear and recreating the vector index.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0"))
 GENERATION_MODEL = os.getenv("GENERATION_MODEL", "gpt-4o")
 
+# Optional OpenAI-compatible endpoint (e.g., vLLM or TGI) for simple queries.
+# When unset, every query is answered by GENERATION_MODEL.
+LOCAL_GENERATION_URL = os.getenv("LOCAL_GENERATION_URL")
+LOCAL_GENERATION_MODEL = os.getenv("LOCAL_GENERATION_MODEL", "meta-llama/Llama-3.1-8B-Instruct")
+LOCAL_GENERATION_API_KEY = os.getenv("LOCAL_GENERATION_API_KEY", "EMPTY")
+# Queries with at most this many words (and no ticket IDs or comparisons) go local
+LOCAL_ROUTE_MAX_WORDS = int(os.getenv("LOCAL_ROUTE_MAX_WORDS", "12"))
+
+# =============================================================================
+# EVALUATION CONFIGURATION
+# =============================================================================
+# Evaluator LLM responses are cached on disk so repeated eval runs are free
+EVAL_CACHE_DIR = os.getenv("EVAL_CACHE_DIR", ".eval_cache")
+# Number of evaluation cases judged concurrently in evaluate_batch
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "8"))
+# Token budgets for the context shown to the groundedness and relevance judges
+EVAL_CONTEXT_TOKENS = int(os.getenv("EVAL_CONTEXT_TOKENS", "2000"))
+EVAL_DOC_TOKENS = int(os.getenv("EVAL_DOC_TOKENS", "250"))
+# Answers whose words overlap the context at least this much are scored as
+# grounded without calling the judge model
+GROUNDEDNESS_FAST_PATH_OVERLAP = float(os.getenv("GROUNDEDNESS_FAST_PATH_OVERLAP", "0.9"))
+
+# Answer returned when retrieval finds no documents
+NO_CONTEXT_ANSWER = "I couldn't find relevant documents to answer your question."
+
 # =============================================================================
 # TEAM CLASSIFICATION PATTERNS
 # =============================================================================
@@ -55,3 +161,32 @@ TEAM_PATTERNS = {
     "AP": "Feature Request",
     "DEM": "Demand"
 }
+
+# Single compiled matcher over all team prefixes; longer prefixes come first so
+# the most specific pattern wins (e.g., "TST12" before "TST")
+TEAM_PREFIX_RE = re.compile(
+    "^(" + "|".join(re.escape(p) for p in sorted(TEAM_PATTERNS, key=len, reverse=True)) + ")"
+)
+
+# =============================================================================
+# PROVIDER GAZETTEER
+# =============================================================================
+# Payment providers recognized locally during ingestion (canonical spelling).
+# Documents mentioning none of them fall back to LLM extraction.
+KNOWN_PROVIDERS = [
+    "SafetyPay", "Stripe", "Adyen", "MercadoPago", "PayPal", "dLocal", "PayU",
+    "Kushki", "Conekta", "Transbank", "PagSeguro", "Getnet", "Worldpay",
+    "Braintree", "Cybersource", "Nuvei", "Openpay", "Khipu", "Culqi",
+    "Niubiz", "Wompi", "Checkout.com"
+]
+# Payment methods and rails that many providers offer; they are mentioned
+# throughout provider documents and are never reported as provider_name
+PAYMENT_METHODS = [
+    "PIX", "SPEI", "PSE", "OXXO", "Boleto", "Nequi", "Yape", "Daviplata",
+    "Efecty", "Webpay"
+]
+# Alternative spellings -> canonical provider name
+PROVIDER_ALIASES = {
+    "Mercado Pago": "MercadoPago",
+    "Safety Pay": "SafetyPay"
+}
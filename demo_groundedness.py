@@ -40,7 +40,9 @@ groundedness = evaluator.evaluate(
 
 # Show results
 print('='*60)
-print(f'Groundedness Score: {groundedness["groundedness_score"]:.2f}')
+# NOT_APPLICABLE verdicts (no documents retrieved) have no score
+score = groundedness["groundedness_score"]
+print(f'Groundedness Score: {"n/a" if score is None else f"{score:.2f}"}')
 print(f'Verdict: {groundedness["verdict"]}')
 print('\nAnalysis:')
 print(groundedness["analysis"])
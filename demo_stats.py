@@ -3,28 +3,36 @@
 Demo script to show database statistics.
 """
 
-from pymongo import MongoClient
-from config import MONGODB_URI, MONGODB_DATABASE, MONGODB_COLLECTION
+from config import MONGODB_DATABASE, MONGODB_COLLECTION, MONGODB_STATS_COLLECTION
+from mongo_client import get_mongo_client
+from utils.stats import counters_in, load_counters
 
 # Connect to MongoDB
-client = MongoClient(MONGODB_URI)
+client = get_mongo_client()
 collection = client[MONGODB_DATABASE][MONGODB_COLLECTION]
 
+# Counters materialized on ingest: a single small find() instead of collection
+# scans (rebuilt once if they do not cover the whole collection)
+counters = load_counters(collection, client[MONGODB_DATABASE][MONGODB_STATS_COLLECTION])
+
+total = counters.get("total", 0)
+by_type = counters_in(counters, "type")
+tst12 = counters.get("prefix:TST12", 0)
+by_team = counters_in(counters, "team")
+
 # Print statistics
 print('='*60)
 print('📊 DATABASE STATISTICS')
 print('='*60)
-print(f'Total documents: {collection.count_documents({}):,}')
-print(f'Jira tickets: {collection.count_documents({"metadata.document_type": "jira"})}')
-print(f'Confluence docs: {collection.count_documents({"metadata.document_type": "confluence"})}')
-print(f'TST12 tickets: {collection.count_documents({"metadata.source_id": {"$regex": "^TST12"}})}')
+print(f'Total documents: {total:,}')
+print(f'Jira tickets: {by_type.get("jira", 0)}')
+print(f'Confluence docs: {by_type.get("confluence", 0)}')
+print(f'TST12 tickets: {tst12}')
 print('='*60)
 
 # Show team breakdown
 print('\nTEAM BREAKDOWN:')
 print('='*60)
-teams = collection.distinct("metadata.team")
-for team in sorted([t for t in teams if t]):
-    count = collection.count_documents({"metadata.team": team})
-    print(f'{team}: {count} tickets')
+for team in sorted(by_team):
+    print(f'{team}: {by_team[team]} tickets')
 print('='*60)
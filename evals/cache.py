@@ -0,0 +1,114 @@
+"""
+Disk-persistent response cache for evaluator LLM calls.
+
+Evaluation runs are usually repeated over the same queries while tuning the
+pipeline. Caching the raw completion text keyed by (model, prompt) turns those
+reruns into local SQLite lookups instead of OpenAI round-trips.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Callable, Optional
+
+from config import EVAL_CACHE_DIR
+from utils.hashing import collapse_whitespace
+from utils.retry import call_with_backoff
+
+
+class DiskCacheBackend:
+    """SQLite-backed key/value store for LLM responses."""
+
+    def __init__(self, namespace: str, cache_dir: str = EVAL_CACHE_DIR):
+        """
+        Initialize the cache.
+
+        Args:
+            namespace: Cache file name (e.g., 'groundedness', 'precision')
+            cache_dir: Directory where cache files are stored
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, f"{namespace}.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        """
+        Build the cache key for a (model, prompt) pair, ignoring whitespace in the prompt.
+
+        Case is kept: judge prompts embed documents and answers where it
+        matters (ticket IDs, provider names, "NOT").
+        """
+        return hashlib.sha256(f"{model}\0{collapse_whitespace(prompt)}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str):
+        """Store a response under key."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)", (key, value)
+            )
+            self._conn.commit()
+
+
+def cached_chat_completion(
+    client,
+    cache: DiskCacheBackend,
+    model: str,
+    prompt: str,
+    max_tokens: int,
+    system_prompt: Optional[str] = None,
+    validate: Optional[Callable[[str], bool]] = None,
+    **kwargs
+) -> str:
+    """
+    Run a chat completion through the disk cache.
+
+    Args:
+        client: OpenAI client
+        cache: Cache backend to read from and write to
+        model: Model name
+        prompt: User prompt
+        max_tokens: Maximum tokens in response
+        system_prompt: Optional static system prompt sent before the user prompt
+        validate: Optional check of the completion text; responses that fail
+                  it (e.g., truncated JSON) are returned but never cached, and
+                  cached responses that fail it are fetched again
+        **kwargs: Extra arguments for chat.completions.create (e.g., response_format)
+
+    Returns:
+        Stripped completion text
+    """
+    messages = [{"role": "user", "content": prompt}]
+    if system_prompt:
+        messages.insert(0, {"role": "system", "content": system_prompt})
+
+    key = cache.make_key(model, f"{system_prompt or ''}\0{prompt}")
+    cached = cache.get(key)
+    if cached is not None and (validate is None or validate(cached)):
+        return cached
+
+    response = call_with_backoff(
+        client.chat.completions.create,
+        model=model,
+        max_tokens=max_tokens,
+        messages=messages,
+        **kwargs
+    )
+    text = response.choices[0].message.content.strip()
+    if validate is None or validate(text):
+        cache.set(key, text)
+    return text
@@ -6,10 +6,49 @@ Groundedness measures: "Is the generated answer supported by the retrieved conte
 This prevents hallucinations and ensures the model only uses provided information.
 """
 
-from typing import List, Dict
-from openai import OpenAI
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+
+from config import (
+    GENERATION_MODEL,
+    EVAL_CONCURRENCY,
+    EVAL_CONTEXT_TOKENS,
+    GROUNDEDNESS_FAST_PATH_OVERLAP,
+    NO_CONTEXT_ANSWER
+)
+from llm_client import get_client
+from evals.cache import DiskCacheBackend, cached_chat_completion
+from utils.tokens import pack_documents
+
+# Static judge instructions, sent first so repeated calls share a cacheable prefix
+_SYSTEM_PROMPT = """Evaluate whether the GENERATED RESPONSE is completely grounded in the provided CONTEXT.
 
-from config import OPENAI_API_KEY, GENERATION_MODEL
+TASK:
+Analyze whether each statement in the generated response can be verified in the context.
+
+Respond in the following format:
+1. VERDICT: [GROUNDED/PARTIALLY_GROUNDED/NOT_GROUNDED]
+2. SCORE: [0.0 to 1.0, where 1.0 = completely grounded]
+3. ANALYSIS: [Brief explanation of which parts are grounded and which are not]"""
+
+_WORD_RE = re.compile(r'\w+')
+
+# Verdict values; "PARTIALLY"/"NOT" come first so they win over plain "GROUNDED"
+_VERDICT = r'(PARTIALLY[_ ]GROUNDED|NOT[_ ]GROUNDED|GROUNDED)'
+_NUMBER = r'(\d*\.?\d+)'
+_ANALYSIS = r'(?:ANALYSIS|AN[AÁ]LISIS)\W*(.*\S)'
+
+# Whole well-formed response: VERDICT ... SCORE ... ANALYSIS (analysis may span lines)
+_EVAL_RE = re.compile(
+    r'(?:VERDICT|VEREDICTO)\W*' + _VERDICT + r'\b.*?SCORE\W*' + _NUMBER + r'.*?' + _ANALYSIS,
+    re.S | re.I
+)
+
+# Per-field fallbacks for responses that don't follow the format exactly
+_VERDICT_RE = re.compile(_VERDICT, re.I)
+_SCORE_RE = re.compile(r'(?:SCORE\W*|^\s*2\.\s*)' + _NUMBER, re.I | re.M)
+_ANALYSIS_RE = re.compile(_ANALYSIS, re.S | re.I)
 
 
 class GroundednessEvaluator:
@@ -21,7 +60,8 @@ class GroundednessEvaluator:
 
     def __init__(self):
         """Initialize groundedness evaluator."""
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.client = get_client()
+        self._cache = DiskCacheBackend("groundedness")
 
     def evaluate(
         self,
@@ -38,45 +78,52 @@ class GroundednessEvaluator:
             context_docs: Documents that were used as context
 
         Returns:
-            Dictionary with groundedness score and analysis
+            Dictionary with groundedness score and analysis. "source" is
+            "fast_path" when the verdict was decided without calling the judge.
         """
-        # Build context string
+        # The fast path and the judge look at the same documents: those that
+        # fit the judge's token budget
+        packed_docs = pack_documents(context_docs, EVAL_CONTEXT_TOKENS)
+
+        fast_result = self._fast_path(generated_answer, packed_docs)
+        if fast_result is not None:
+            score, verdict, analysis = fast_result
+            return {
+                "groundedness_score": score,
+                "verdict": verdict,
+                "analysis": analysis,
+                "query": query,
+                "answer": generated_answer,
+                "context_docs_count": len(context_docs),
+                "source": "fast_path"
+            }
+
+        # Build context string from whole documents that fit the judge's token budget
         context_text = "\n\n".join([
             f"[Documento {i+1}]\n{doc['content']}"
-            for i, doc in enumerate(context_docs)
+            for i, doc in enumerate(packed_docs)
         ])
 
-        # Prompt for groundedness evaluation
-        prompt = f"""Evaluate whether the GENERATED RESPONSE is completely grounded in the provided CONTEXT.
-
-ORIGINAL QUESTION:
+        # Prompt for groundedness evaluation (instructions live in _SYSTEM_PROMPT)
+        prompt = f"""ORIGINAL QUESTION:
 {query}
 
 PROVIDED CONTEXT:
-{context_text[:3000]}  # Truncate for efficiency
+{context_text}
 
 GENERATED RESPONSE:
-{generated_answer}
-
-TASK:
-Analyze whether each statement in the generated response can be verified in the context.
-
-Respond in the following format:
-1. VERDICT: [GROUNDED/PARTIALLY_GROUNDED/NOT_GROUNDED]
-2. SCORE: [0.0 to 1.0, where 1.0 = completely grounded]
-3. ANALYSIS: [Brief explanation of which parts are grounded and which are not]
-
-VERDICT:"""
+{generated_answer}"""
 
         # Use gpt-4o-mini for faster and cheaper groundedness evaluation
-        response = self.client.chat.completions.create(
+        evaluation_text = cached_chat_completion(
+            self.client,
+            self._cache,
             model="gpt-4o-mini",
+            prompt=prompt,
             max_tokens=500,
-            messages=[{"role": "user", "content": prompt}]
+            system_prompt=_SYSTEM_PROMPT
         )
 
-        evaluation_text = response.choices[0].message.content.strip()
-
         # Parse the response
         score, verdict, analysis = self._parse_evaluation(evaluation_text)
 
@@ -86,65 +133,75 @@ VERDICT:"""
             "analysis": analysis,
             "query": query,
             "answer": generated_answer,
-            "context_docs_count": len(context_docs)
+            "context_docs_count": len(context_docs),
+            "source": "llm"
         }
 
+    @staticmethod
+    def _fast_path(generated_answer: str, context_docs: List[Dict]) -> Optional[tuple]:
+        """
+        Decide trivial cases without an LLM call.
+
+        - The "no documents" answer makes no claims, so groundedness does not apply.
+        - An answer whose words almost all appear in the context is grounded.
+
+        Args:
+            generated_answer: The generated response
+            context_docs: Context documents the judge would see (already packed)
+
+        Returns:
+            Tuple of (score, verdict, analysis), or None if the judge is needed
+        """
+        if generated_answer.strip() == NO_CONTEXT_ANSWER:
+            return None, "NOT_APPLICABLE", "No documents were retrieved, so the answer makes no claims."
+
+        answer_words = set(_WORD_RE.findall(generated_answer.lower()))
+        if not answer_words:
+            return None
+
+        context_words = set()
+        for doc in context_docs:
+            context_words.update(_WORD_RE.findall(doc["content"].lower()))
+
+        overlap = len(answer_words & context_words) / len(answer_words)
+        if overlap >= GROUNDEDNESS_FAST_PATH_OVERLAP:
+            return 1.0, "GROUNDED", f"{overlap:.0%} of the answer's words appear in the context."
+
+        return None
+
     def _parse_evaluation(self, evaluation_text: str) -> tuple:
         """
         Parse evaluation response into score, verdict, and analysis.
 
+        Well-formed responses are parsed with a single regex match; anything
+        else falls back to searching for each field independently.
+
         Args:
             evaluation_text: Raw evaluation text from LLM
 
         Returns:
             Tuple of (score, verdict, analysis)
         """
-        lines = evaluation_text.split("\n")
+        match = _EVAL_RE.search(evaluation_text)
+        if match:
+            raw_verdict, raw_score, analysis = match.groups()
+        else:
+            verdict_match = _VERDICT_RE.search(evaluation_text)
+            score_match = _SCORE_RE.search(evaluation_text)
+            analysis_match = _ANALYSIS_RE.search(evaluation_text)
+
+            raw_verdict = verdict_match.group(1) if verdict_match else None
+            raw_score = score_match.group(1) if score_match else None
+            analysis = analysis_match.group(1) if analysis_match else ""
+
+        verdict = raw_verdict.upper().replace(" ", "_") if raw_verdict else "UNKNOWN"
 
-        verdict = "UNKNOWN"
         score = None
-        analysis = ""
-
-        for line in lines:
-            line = line.strip()
-
-            if line.startswith("1.") or "VEREDICTO:" in line:
-                if "GROUNDED" in line.upper():
-                    if "PARTIALLY" in line.upper():
-                        verdict = "PARTIALLY_GROUNDED"
-                    elif "NOT" in line.upper():
-                        verdict = "NOT_GROUNDED"
-                    else:
-                        verdict = "GROUNDED"
-
-            elif line.startswith("2.") or "SCORE:" in line:
-                # Extract score - look specifically after "SCORE:" or number prefix
-                import re
-
-                # First, try to find score after "SCORE:" keyword
-                if "SCORE:" in line.upper():
-                    score_part = line.split(":", 1)[-1].strip()
-                    # Match decimal numbers like 0.95, 1.0, 0.5
-                    match = re.search(r'(\d+\.?\d*)', score_part)
-                    if match:
-                        parsed_score = float(match.group(1))
-                        # Validate score is in valid range [0.0, 1.0]
-                        if 0.0 <= parsed_score <= 1.0:
-                            score = parsed_score
-
-                # If not found, try pattern like "2. 0.95" (number followed by score)
-                if score is None:
-                    # Match pattern: optional prefix, then decimal number
-                    match = re.search(r'^\d+\.\s*(\d+\.?\d*)', line)
-                    if match:
-                        parsed_score = float(match.group(1))
-                        # Validate score is in valid range [0.0, 1.0]
-                        if 0.0 <= parsed_score <= 1.0:
-                            score = parsed_score
-
-            elif line.startswith("3.") or "ANÁLISIS:" in line or "ANALISIS:" in line:
-                # Extract analysis (may span multiple lines)
-                analysis = line.split(":", 1)[-1].strip()
+        if raw_score is not None:
+            parsed_score = float(raw_score)
+            # Validate score is in valid range [0.0, 1.0]
+            if 0.0 <= parsed_score <= 1.0:
+                score = parsed_score
 
         # If score not found or invalid, infer from verdict
         if score is None:
@@ -156,7 +213,7 @@ VERDICT:"""
             }
             score = score_map.get(verdict, 0.0)
 
-        return score, verdict, analysis
+        return score, verdict, analysis.strip()
 
     def evaluate_batch(
         self,
@@ -171,17 +228,20 @@ VERDICT:"""
         Returns:
             Dictionary with average groundedness and per-case results
         """
-        results = []
-
-        for test_case in test_cases:
-            eval_result = self.evaluate(
-                query=test_case["query"],
-                generated_answer=test_case["answer"],
-                context_docs=test_case["context_docs"]
-            )
-            results.append(eval_result)
-
-        avg_score = sum(r["groundedness_score"] for r in results) / len(results) if results else 0.0
+        # Each evaluation blocks on network I/O, so run them concurrently
+        with ThreadPoolExecutor(max_workers=EVAL_CONCURRENCY) as executor:
+            results = list(executor.map(
+                lambda test_case: self.evaluate(
+                    query=test_case["query"],
+                    generated_answer=test_case["answer"],
+                    context_docs=test_case["context_docs"]
+                ),
+                test_cases
+            ))
+
+        # NOT_APPLICABLE cases have no score and are left out of the average
+        scores = [r["groundedness_score"] for r in results if r["groundedness_score"] is not None]
+        avg_score = sum(scores) / len(scores) if scores else 0.0
 
         # Count verdicts
         verdict_counts = {}
@@ -213,6 +273,7 @@ if __name__ == "__main__":
 
     result = evaluator.evaluate(query, generated_answer, context_docs)
 
-    print(f"Groundedness Score: {result['groundedness_score']:.2f}")
+    score = result["groundedness_score"]
+    print(f"Groundedness Score: {'n/a' if score is None else f'{score:.2f}'}")
     print(f"Verdict: {result['verdict']}")
     print(f"Analysis: {result['analysis']}")
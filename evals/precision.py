@@ -6,10 +6,22 @@ Precision = (Number of relevant documents retrieved) / (Total documents retrieve
 This measures: "Of all the documents we retrieved, how many are actually relevant?"
 """
 
-from typing import List, Dict, Tuple
-from openai import OpenAI
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 
-from config import OPENAI_API_KEY, GENERATION_MODEL
+from config import GENERATION_MODEL, EVAL_CONCURRENCY, EVAL_DOC_TOKENS
+from llm_client import get_client
+from evals.cache import DiskCacheBackend, cached_chat_completion
+from utils.tokens import truncate_to_tokens
+
+# Static judge instructions, sent first so repeated calls share a cacheable prefix
+_SYSTEM_PROMPT = """Evaluate whether each of the documents provided by the user is RELEVANT to answer the user's question.
+
+For every document, decide if it is relevant to answer the question and give a brief justification (maximum 1 line).
+
+Respond ONLY with JSON in this format:
+{"judgments": [{"doc": 1, "relevant": true, "reason": "..."}]}"""
 
 
 class PrecisionEvaluator:
@@ -21,7 +33,8 @@ class PrecisionEvaluator:
 
     def __init__(self):
         """Initialize precision evaluator."""
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.client = get_client()
+        self._cache = DiskCacheBackend("precision")
 
     def evaluate(
         self,
@@ -72,7 +85,10 @@ class PrecisionEvaluator:
         retrieved_docs: List[Dict]
     ) -> List[Dict]:
         """
-        Use Claude to judge relevance of each retrieved document.
+        Use an LLM to judge relevance of all retrieved documents in one call.
+
+        All documents are sent in a single numbered prompt and the model returns
+        a JSON verdict per document, so k documents cost one round-trip instead of k.
 
         Args:
             query: The search query
@@ -81,47 +97,84 @@ class PrecisionEvaluator:
         Returns:
             List of relevance judgments
         """
-        judgments = []
-
-        for i, doc in enumerate(retrieved_docs):
-            content = doc.get("content", "")
-            metadata = doc.get("metadata", {})
-
-            prompt = f"""Evaluate whether the following document is RELEVANT to answer the user's question.
+        documents_text = "\n\n".join(
+            f"DOC {i}:\n{truncate_to_tokens(doc.get('content', ''), EVAL_DOC_TOKENS)}"
+            for i, doc in enumerate(retrieved_docs, 1)
+        )
 
-QUESTION:
+        prompt = f"""QUESTION:
 {query}
 
-DOCUMENT:
-{content[:1000]}  # Truncated for efficiency
-
-Is this document relevant to answer the question?
-
-Respond ONLY with "RELEVANT" or "NOT RELEVANT", followed by a brief justification (maximum 1 line).
+DOCUMENTS:
+{documents_text}"""
 
-Format: [RELEVANT/NOT RELEVANT] - [justification]"""
+        # Use gpt-4o-mini for faster and cheaper relevance judgments
+        judgment_text = cached_chat_completion(
+            self.client,
+            self._cache,
+            model="gpt-4o-mini",
+            prompt=prompt,
+            max_tokens=100 * len(retrieved_docs),
+            system_prompt=_SYSTEM_PROMPT,
+            validate=lambda text: self._judgment_items(text) is not None,
+            response_format={"type": "json_object"}
+        )
 
-            # Use gpt-4o-mini for faster and cheaper relevance judgments
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                max_tokens=100,
-                messages=[{"role": "user", "content": prompt}]
-            )
+        verdicts = self._parse_judgments(judgment_text)
 
-            judgment_text = response.choices[0].message.content.strip()
-
-            is_relevant = "RELEVANT" in judgment_text.split("-")[0].upper() and "NOT RELEVANT" not in judgment_text.upper()
+        judgments = []
+        for i, doc in enumerate(retrieved_docs):
+            metadata = doc.get("metadata", {})
+            verdict = verdicts.get(i + 1, {})
+            is_relevant = verdict.get("relevant") is True
+            reason = verdict.get("reason", "No judgment returned")
 
             judgments.append({
                 "document_index": i,
                 "source_id": metadata.get("source_id"),
                 "is_relevant": is_relevant,
-                "judgment": judgment_text,
+                "judgment": f"{'RELEVANT' if is_relevant else 'NOT RELEVANT'} - {reason}",
                 "similarity_score": doc.get("similarity")
             })
 
         return judgments
 
+    @staticmethod
+    def _judgment_items(judgment_text: str) -> Optional[List]:
+        """Return the "judgments" list of a relevance response, or None if it is malformed."""
+        try:
+            payload = json.loads(judgment_text)
+        except json.JSONDecodeError:
+            return None
+
+        items = payload.get("judgments") if isinstance(payload, dict) else None
+        return items if isinstance(items, list) else None
+
+    @staticmethod
+    def _parse_judgments(judgment_text: str) -> Dict[int, Dict]:
+        """
+        Parse the JSON relevance response into a mapping of document number to verdict.
+
+        Args:
+            judgment_text: Raw JSON text from LLM
+
+        Returns:
+            Dictionary keyed by 1-based document number
+        """
+        items = PrecisionEvaluator._judgment_items(judgment_text)
+        if items is None:
+            print(f"Could not parse relevance judgments: {judgment_text[:200]}")
+            return {}
+
+        verdicts = {}
+        for item in items:
+            try:
+                verdicts[int(item["doc"])] = item
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        return verdicts
+
     def evaluate_batch(
         self,
         test_queries: List[Tuple[str, List[Dict]]]
@@ -135,14 +188,17 @@ Format: [RELEVANT/NOT RELEVANT] - [justification]"""
         Returns:
             Dictionary with average precision and per-query results
         """
-        results = []
-
-        for query, docs in test_queries:
-            eval_result = self.evaluate(query, docs)
-            results.append({
-                "query": query,
-                **eval_result
-            })
+        # Each evaluation blocks on network I/O, so run them concurrently
+        with ThreadPoolExecutor(max_workers=EVAL_CONCURRENCY) as executor:
+            eval_results = list(executor.map(
+                lambda test_query: self.evaluate(*test_query),
+                test_queries
+            ))
+
+        results = [
+            {"query": query, **eval_result}
+            for (query, _), eval_result in zip(test_queries, eval_results)
+        ]
 
         avg_precision = sum(r["precision"] for r in results) / len(results) if results else 0.0
 
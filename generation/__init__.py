@@ -1,5 +1,17 @@
 """Generation module for producing responses."""
 
-from .generator import ResponseGenerator
+from importlib import import_module
 
-__all__ = ["ResponseGenerator"]
+# Exports are imported on first access, so importing generation.sem_cache
+# (e.g., to clear it during ingestion) does not load the OpenAI SDK
+_EXPORTS = {
+    "ResponseGenerator": ".generator"
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,11 +4,70 @@ Response generation using OpenAI GPT-4.
 This module generates answers based on retrieved context.
 """
 
-from typing import List, Dict, Optional
-from openai import OpenAI
-
-from config import OPENAI_API_KEY, GENERATION_MODEL
+import atexit
+import re
+import unicodedata
+from typing import List, Dict, Iterator, Optional
+
+from config import (
+    TOP_K,
+    FACTOID_TOP_K,
+    FACTOID_MAX_WORDS,
+    MULTI_HOP_TOP_K,
+    GENERATION_MODEL,
+    LOCAL_GENERATION_URL,
+    LOCAL_GENERATION_MODEL,
+    LOCAL_ROUTE_MAX_WORDS,
+    SEMANTIC_CACHE_ENABLED,
+    MAX_CONTEXT_TOKENS,
+    DEDUP_MAX_HAMMING_DISTANCE,
+    NO_CONTEXT_ANSWER
+)
+from llm_client import get_client, get_local_client
 from retrieval.retriever import HybridRetriever
+from generation.sem_cache import SemanticCache
+from utils.tokens import pack_documents
+from utils.hashing import simhash, hamming_distance, hash_text
+
+# Jira ticket IDs for all known project prefixes, matched in a single pass
+_TICKET_RE = re.compile(r'(AP-\d+|CORECM-\d+|PFU-\d+|TST\d+-\d+|DEM-\d+)')
+_TICKET_PREFIXES = ("AP-", "CORECM-", "PFU-", "TST", "DEM-")
+
+# Phrases that suggest a multi-hop or comparison question
+_MULTI_HOP_MARKERS = (" and ", " vs ", " versus ", " compared")
+
+# Translation table that drops combining diacritics left over after NFD normalization
+_COMBINING = {codepoint: None for codepoint in range(0x300, 0x370)}
+
+# Static instructions go first, as a system message, so every request shares
+# an identical prefix that the provider's automatic prompt caching can reuse
+_SYSTEM_PROMPT = """You are an expert assistant in Yuno technical documentation, a fintech payments platform.
+
+Your task is to answer questions based ONLY on the context provided by the user message.
+
+IMPORTANT RULES:
+1. Only use information present in the context
+2. If the information is not in the context, say you don't have it
+3. Cite sources when relevant (mention the document ID)
+4. Respond in English clearly and concisely
+5. If you mention a payment provider, include relevant technical details (API, credentials, supported countries, etc.)"""
+
+
+def _adaptive_top_k(query: str) -> int:
+    """
+    Choose how many documents to retrieve from the shape of the query.
+
+    Short factoid questions need little context (less noise, fewer prompt
+    tokens); multi-hop and comparison questions need more for recall.
+    """
+    if len(query.split()) <= FACTOID_MAX_WORDS:
+        return FACTOID_TOP_K
+
+    query_lower = f" {query.lower()} "
+    if any(marker in query_lower for marker in _MULTI_HOP_MARKERS):
+        return MULTI_HOP_TOP_K
+
+    return TOP_K
 
 
 class ResponseGenerator:
@@ -21,14 +80,41 @@ class ResponseGenerator:
         Args:
             embedding_provider: Embedding provider for retriever
         """
-        self.openai_client = OpenAI(api_key=OPENAI_API_KEY)
+        self.openai_client = get_client()
         self.retriever = HybridRetriever(embedding_provider=embedding_provider)
 
+        self.semantic_cache = None
+        if SEMANTIC_CACHE_ENABLED:
+            # One cache per embedding space (vectors from another model or
+            # dimension setting are not comparable) and per generation setup,
+            # so changing the model, prompt or retrieval budget starts afresh
+            embedder = self.retriever.embedding_generator
+            generation_settings = hash_text(repr((
+                GENERATION_MODEL,
+                LOCAL_GENERATION_MODEL if LOCAL_GENERATION_URL else None,
+                LOCAL_ROUTE_MAX_WORDS,
+                _SYSTEM_PROMPT,
+                MAX_CONTEXT_TOKENS,
+                TOP_K,
+                FACTOID_TOP_K,
+                FACTOID_MAX_WORDS,
+                MULTI_HOP_TOP_K
+            )))[:12]
+            self.semantic_cache = SemanticCache(
+                namespace=(
+                    f"{embedding_provider}_{embedder.model_name}_{embedder.dimensions}"
+                    f"_{generation_settings}"
+                ),
+                dimensions=embedder.dimensions
+            )
+            atexit.register(self.semantic_cache.save)
+
     def generate_response(
         self,
         query: str,
         context_docs: List[Dict],
-        max_tokens: int = 2048
+        max_tokens: int = 2048,
+        stream: bool = False
     ) -> Dict:
         """
         Generate response using OpenAI GPT-4 based on retrieved context.
@@ -37,84 +123,194 @@ class ResponseGenerator:
             query: User query
             context_docs: Retrieved documents with content and metadata
             max_tokens: Maximum tokens in response
+            stream: If True, return the answer as an iterator of text deltas
+                    under "answer_stream" instead of a complete "answer" string.
+                    "usage" is filled in once the stream is exhausted.
 
         Returns:
             Dictionary with response and metadata
         """
+        # Drop near-duplicate chunks so the prompt doesn't pay for repeated content
+        context_docs = self._dedupe_documents(context_docs)
+
+        # Keep whole documents, in rank order, until the token budget is used
+        packed_docs = pack_documents(context_docs, MAX_CONTEXT_TOKENS)
+        if len(packed_docs) < len(context_docs):
+            print(f"Context budget reached: dropped {len(context_docs) - len(packed_docs)} of {len(context_docs)} documents")
+        context_docs = packed_docs
+
         # Build context from retrieved documents
         context_text = self._build_context(context_docs)
 
         # Build prompt
-        prompt = self._build_prompt(query, context_text)
+        messages = self._build_messages(query, context_text)
+
+        client, model = self._route(query)
+
+        if stream:
+            response = client.chat.completions.create(
+                model=model,
+                max_tokens=max_tokens,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+
+            usage = {"input_tokens": None, "output_tokens": None}
+
+            return {
+                "answer_stream": self._stream_answer(response, usage),
+                "sources": self._extract_sources(context_docs),
+                "model": model,
+                "usage": usage
+            }
 
         # Generate response
-        response = self.openai_client.chat.completions.create(
-            model=GENERATION_MODEL,
+        response = client.chat.completions.create(
+            model=model,
             max_tokens=max_tokens,
-            messages=[{"role": "user", "content": prompt}]
+            messages=messages
         )
 
         return {
             "answer": response.choices[0].message.content,
             "sources": self._extract_sources(context_docs),
-            "model": GENERATION_MODEL,
+            "model": model,
             "usage": {
                 "input_tokens": response.usage.prompt_tokens,
                 "output_tokens": response.usage.completion_tokens
             }
         }
 
+    def _route(self, query: str) -> tuple:
+        """
+        Pick the client and model that should answer a query.
+
+        Short, single-hop questions go to the local endpoint when
+        LOCAL_GENERATION_URL is configured; ticket lookups, comparisons and
+        longer questions stay on GENERATION_MODEL.
+
+        Args:
+            query: User query
+
+        Returns:
+            Tuple of (client, model name)
+        """
+        if LOCAL_GENERATION_URL:
+            query_lower = f" {query.lower()} "
+            is_simple = (
+                len(query.split()) <= LOCAL_ROUTE_MAX_WORDS
+                and not _TICKET_RE.search(query.upper())
+                and not any(marker in query_lower for marker in _MULTI_HOP_MARKERS)
+            )
+            if is_simple:
+                return get_local_client(), LOCAL_GENERATION_MODEL
+
+        return self.openai_client, GENERATION_MODEL
+
+    @staticmethod
+    def _stream_answer(response, usage: Dict) -> Iterator[str]:
+        """
+        Yield text deltas from a streamed completion.
+
+        The final chunk carries token usage (requested via include_usage),
+        which is written into the shared usage dict.
+        """
+        for chunk in response:
+            if chunk.usage:
+                usage["input_tokens"] = chunk.usage.prompt_tokens
+                usage["output_tokens"] = chunk.usage.completion_tokens
+
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
     def query(
         self,
         query: str,
         filters: Optional[Dict] = None,
-        top_k: int = None
+        top_k: int = None,
+        use_cache: bool = True
     ) -> Dict:
         """
         Complete query pipeline: retrieve + generate.
 
+        Unfiltered queries with default top_k are served from the semantic
+        cache when an identical or near-identical query was answered before.
+
         Args:
             query: User query
             filters: Optional metadata filters
-            top_k: Number of documents to retrieve
+            top_k: Number of documents to retrieve (chosen from the query's
+                   shape when None)
+            use_cache: Whether the semantic cache may be used (disable to
+                       always retrieve and generate, e.g. for evaluation)
 
         Returns:
-            Dictionary with answer and metadata
+            Dictionary with answer and metadata; uncached results also carry
+            the retrieved documents under "context_docs"
         """
+        use_cache = (
+            use_cache and self.semantic_cache is not None
+            and filters is None and top_k is None
+        )
+
+        if use_cache:
+            cached = self.semantic_cache.get_exact(query)
+            if cached is not None:
+                cached["cached"] = True
+                return cached
+
+        # Embed once; the vector is shared by the semantic cache and vector search
+        query_embedding = self.retriever.embed_query(query)
+
+        if use_cache:
+            cached = self.semantic_cache.get_similar(query_embedding)
+            if cached is not None:
+                cached["cached"] = True
+                return cached
+
         # Step 1: Retrieve relevant documents
         context_docs = self.retriever.semantic_search(
             query=query,
             filters=filters,
-            top_k=top_k
+            top_k=top_k if top_k is not None else _adaptive_top_k(query),
+            query_embedding=query_embedding
         )
 
         # Step 2: Generate response
         if not context_docs:
             return {
-                "answer": "I couldn't find relevant documents to answer your question.",
+                "answer": NO_CONTEXT_ANSWER,
                 "sources": [],
-                "retrieved_docs": 0
+                "retrieved_docs": 0,
+                "context_docs": []
             }
 
         result = self.generate_response(query, context_docs)
         result["retrieved_docs"] = len(context_docs)
 
+        if use_cache:
+            self.semantic_cache.add(query, query_embedding, dict(result))
+
+        # Not cached: documents are only needed to evaluate this answer
+        result["context_docs"] = context_docs
+
         return result
 
-    def query_with_analytics(self, query: str) -> Dict:
+    def query_with_analytics(self, query: str, use_cache: bool = True) -> Dict:
         """
         Handle analytical queries (counts, aggregations).
 
         Args:
             query: User query
+            use_cache: Whether semantic search answers may come from the
+                       semantic cache
 
         Returns:
             Dictionary with answer
         """
-        import unicodedata
         # Normalize query (remove accents and lowercase)
-        query_normalized = unicodedata.normalize('NFD', query.lower())
-        query_normalized = ''.join(c for c in query_normalized if not unicodedata.combining(c))
+        query_normalized = unicodedata.normalize('NFD', query.lower()).translate(_COMBINING)
 
         # Detect analytical queries
         if "cuantos" in query_normalized and "integraciones" in query_normalized:
@@ -171,7 +367,7 @@ class ResponseGenerator:
                 "query_type": "analytical"
             }
 
-        elif "ticket" in query_normalized and any(prefix in query.upper() for prefix in ["AP-", "CORECM-", "PFU-", "TST", "DEM-"]):
+        elif "ticket" in query_normalized and any(prefix in query.upper() for prefix in _TICKET_PREFIXES):
             # Extract ticket ID
             ticket_id = self._extract_ticket_id(query)
 
@@ -195,7 +391,21 @@ class ResponseGenerator:
                     }
 
         # Default: semantic search
-        return self.query(query)
+        return self.query(query, use_cache=use_cache)
+
+    def _dedupe_documents(self, context_docs: List[Dict]) -> List[Dict]:
+        """Remove documents that are near-duplicates of a higher-ranked document."""
+        kept = []
+        fingerprints = []
+
+        for doc in context_docs:
+            fingerprint = simhash(doc["content"])
+            if any(hamming_distance(fingerprint, seen) <= DEDUP_MAX_HAMMING_DISTANCE for seen in fingerprints):
+                continue
+            kept.append(doc)
+            fingerprints.append(fingerprint)
+
+        return kept
 
     def _build_context(self, context_docs: List[Dict]) -> str:
         """Build context string from retrieved documents."""
@@ -212,65 +422,43 @@ class ResponseGenerator:
 
         return "\n".join(context_parts)
 
-    def _build_prompt(self, query: str, context: str) -> str:
-        """Build prompt for Claude."""
-        return f"""You are an expert assistant in Yuno technical documentation, a fintech payments platform.
-
-Your task is to answer questions based ONLY on the context provided below.
-
-IMPORTANT RULES:
-1. Only use information present in the context
-2. If the information is not in the context, say you don't have it
-3. Cite sources when relevant (mention the document ID)
-4. Respond in English clearly and concisely
-5. If you mention a payment provider, include relevant technical details (API, credentials, supported countries, etc.)
+    def _build_messages(self, query: str, context: str) -> List[Dict]:
+        """Build chat messages: static system prompt first, then per-query content."""
+        return [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": self._build_prompt(query, context)}
+        ]
 
-CONTEXT:
+    def _build_prompt(self, query: str, context: str) -> str:
+        """Build the per-query user prompt."""
+        return f"""CONTEXT:
 {context}
 
 USER QUESTION:
-{query}
-
-RESPONSE:"""
+{query}"""
 
     def _extract_sources(self, context_docs: List[Dict]) -> List[Dict]:
-        """Extract source information from context documents."""
-        sources = []
-        seen = set()
+        """Extract source information from context documents (one entry per source_id)."""
+        sources = {}
 
         for doc in context_docs:
             metadata = doc["metadata"]
             source_id = metadata.get("source_id")
 
-            if source_id and source_id not in seen:
-                sources.append({
+            if source_id and source_id not in sources:
+                sources[source_id] = {
                     "id": source_id,
                     "type": metadata.get("document_type"),
                     "provider": metadata.get("provider_name"),
                     "file": metadata.get("source_file")
-                })
-                seen.add(source_id)
+                }
 
-        return sources
+        return list(sources.values())
 
     def _extract_ticket_id(self, text: str) -> Optional[str]:
         """Extract Jira ticket ID from text."""
-        import re
-
-        patterns = [
-            r'(AP-\d+)',
-            r'(CORECM-\d+)',
-            r'(PFU-\d+)',
-            r'(TST\d+-\d+)',
-            r'(DEM-\d+)'
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, text.upper())
-            if match:
-                return match.group(1)
-
-        return None
+        match = _TICKET_RE.search(text.upper())
+        return match.group(1) if match else None
 
 
 # Example usage
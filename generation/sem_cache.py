@@ -0,0 +1,267 @@
+"""
+Semantic response cache for the query pipeline.
+
+Two tiers sit in front of retrieve + generate:
+1. L1 (exact): SHA-256 of the canonicalized query (lowercased, whitespace
+   collapsed) -> cached result
+2. L2 (semantic): cosine similarity between the query embedding and the
+   embeddings of previously answered queries
+
+Paraphrased questions ("How to configure SafetyPay?" vs "SafetyPay setup
+steps?") hit L2 and skip both vector search and generation.
+
+The cache holds at most SEMANTIC_CACHE_MAX_ENTRIES answers (oldest evicted
+first), answers expire after SEMANTIC_CACHE_TTL seconds, and every cache is
+emptied whenever documents are ingested or the collection is cleared.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    SEMANTIC_CACHE_DIR,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_TTL
+)
+from utils.hashing import canonicalize
+
+# Initial number of rows of the embedding buffer (doubled as it fills)
+_INITIAL_CAPACITY = 64
+
+
+# File holding the cache epoch; it changes on every clear_semantic_cache, so
+# caches already loaded by running processes drop their entries too
+_EPOCH_FILE = "epoch"
+
+
+def _read_epoch(cache_dir: str) -> str:
+    """Return the current cache epoch ("" before the first clear)."""
+    try:
+        with open(os.path.join(cache_dir, _EPOCH_FILE), encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def clear_semantic_cache(cache_dir: str = SEMANTIC_CACHE_DIR):
+    """
+    Delete every persisted semantic cache in cache_dir and start a new epoch.
+
+    Called whenever documents are ingested or the collection is cleared,
+    since cached answers were generated from the previous documents.
+
+    Args:
+        cache_dir: Directory where caches are persisted
+    """
+    for path in glob.glob(os.path.join(cache_dir, "*_embeddings.npy")) + \
+            glob.glob(os.path.join(cache_dir, "*_entries.json")):
+        os.remove(path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, _EPOCH_FILE), "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+
+
+class SemanticCache:
+    """Exact + embedding-similarity cache of generated answers."""
+
+    def __init__(
+        self,
+        namespace: str,
+        dimensions: int,
+        cache_dir: str = SEMANTIC_CACHE_DIR,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl: float = SEMANTIC_CACHE_TTL
+    ):
+        """
+        Initialize the cache and load any entries persisted on disk.
+
+        Args:
+            namespace: Cache name; must identify everything the cached answers
+                       depend on (embedding space, generation model, prompt,
+                       retrieval settings), since entries are reused as-is
+            dimensions: Embedding dimensions of the namespace
+            cache_dir: Directory where the cache is persisted
+            threshold: Minimum cosine similarity for a semantic (L2) hit
+            max_entries: Maximum number of cached answers
+            ttl: Seconds an answer stays valid (0 = no expiry)
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self._cache_dir = cache_dir
+        self.dimensions = dimensions
+        self.max_entries = max(1, max_entries)
+        safe_namespace = re.sub(r"[^A-Za-z0-9_.-]", "_", namespace)
+        self._embeddings_path = os.path.join(cache_dir, f"{safe_namespace}_embeddings.npy")
+        self._entries_path = os.path.join(cache_dir, f"{safe_namespace}_entries.json")
+        self._lock = threading.Lock()
+
+        self._exact: Dict[str, int] = {}
+        self._entries: List[Dict] = []
+        # Row i holds the embedding of entry i; rows past len(entries) are free
+        self._embeddings = np.empty((0, dimensions), dtype=np.float32)
+        self._dirty = False
+
+        self._epoch = _read_epoch(cache_dir)
+        self._load()
+
+    @staticmethod
+    def make_key(query: str) -> str:
+        """Build the exact-match (L1) key for a query, ignoring case and whitespace."""
+        return hashlib.sha256(canonicalize(query).encode("utf-8")).hexdigest()
+
+    def get_exact(self, query: str) -> Optional[Dict]:
+        """Return the cached result for an identical query, if any."""
+        with self._lock:
+            self._refresh()
+            index = self._exact.get(self.make_key(query))
+            return dict(self._entries[index]["result"]) if index is not None else None
+
+    def get_similar(self, query_embedding: List[float]) -> Optional[Dict]:
+        """
+        Return the cached result of the most similar previous query.
+
+        Args:
+            query_embedding: Embedding of the incoming query
+
+        Returns:
+            Cached result if the best match reaches the threshold, else None
+        """
+        with self._lock:
+            self._refresh()
+            if not self._entries or len(query_embedding) != self.dimensions:
+                return None
+
+            query_vector = self._normalize(query_embedding)
+            similarities = self._embeddings[:len(self._entries)] @ query_vector
+            best = int(similarities.argmax())
+
+            if similarities[best] < self.threshold:
+                return None
+
+            return dict(self._entries[best]["result"])
+
+    def add(self, query: str, query_embedding: List[float], result: Dict):
+        """
+        Store a result under both tiers.
+
+        Args:
+            query: Original query text
+            query_embedding: Embedding of the query
+            result: Result dict (answer, sources, ...) to cache
+        """
+        if len(query_embedding) != self.dimensions:
+            return
+
+        key = self.make_key(query)
+        query_vector = self._normalize(query_embedding)
+
+        with self._lock:
+            self._refresh()
+            if key in self._exact:
+                return
+
+            if len(self._entries) >= self.max_entries:
+                # Evict the oldest quarter at once so eviction cost is amortized
+                self._evict_oldest(len(self._entries) - self.max_entries + max(1, self.max_entries // 4))
+
+            size = len(self._entries)
+            if size == len(self._embeddings):
+                self._resize(min(max(2 * size, _INITIAL_CAPACITY), self.max_entries))
+
+            self._embeddings[size] = query_vector
+            self._exact[key] = size
+            self._entries.append({"key": key, "result": result, "created_at": time.time()})
+            self._dirty = True
+
+    def _refresh(self):
+        """
+        Drop entries invalidated since they were cached (caller holds the lock).
+
+        A new epoch (documents were ingested) drops everything. Entries are
+        kept in insertion order, so expired ones always form a prefix.
+        """
+        epoch = _read_epoch(self._cache_dir)
+        if epoch != self._epoch:
+            self._epoch = epoch
+            self._entries = []
+            self._exact = {}
+            self._dirty = False
+            return
+
+        if self.ttl > 0:
+            cutoff = time.time() - self.ttl
+            expired = 0
+            while expired < len(self._entries) and self._entries[expired].get("created_at", 0) < cutoff:
+                expired += 1
+            if expired:
+                self._evict_oldest(expired)
+                self._dirty = True
+
+    def _resize(self, capacity: int):
+        """Move the embeddings into a buffer with room for capacity rows."""
+        buffer = np.empty((capacity, self.dimensions), dtype=np.float32)
+        size = len(self._entries)
+        buffer[:size] = self._embeddings[:size]
+        self._embeddings = buffer
+
+    def _evict_oldest(self, count: int):
+        """Drop the count oldest entries, keeping rows aligned with entries."""
+        size = len(self._entries)
+        self._embeddings[:size - count] = self._embeddings[count:size]
+        self._entries = self._entries[count:]
+        self._exact = {entry["key"]: i for i, entry in enumerate(self._entries)}
+
+    def save(self):
+        """Persist the cache to disk if it changed since loading."""
+        with self._lock:
+            self._refresh()
+            if not self._dirty:
+                return
+
+            os.makedirs(os.path.dirname(self._embeddings_path) or ".", exist_ok=True)
+            np.save(self._embeddings_path, self._embeddings[:len(self._entries)])
+            with open(self._entries_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            self._dirty = False
+
+    def _load(self):
+        """Load persisted entries, ignoring missing or inconsistent files."""
+        if not (os.path.exists(self._embeddings_path) and os.path.exists(self._entries_path)):
+            return
+
+        try:
+            embeddings = np.load(self._embeddings_path)
+            with open(self._entries_path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not load semantic cache: {e}")
+            return
+
+        if embeddings.ndim != 2 or embeddings.shape[1] != self.dimensions or len(entries) != len(embeddings):
+            print("Semantic cache files are out of sync with the embedding model, starting empty")
+            return
+
+        # Keep the most recent entries if the size limit was lowered
+        entries = entries[-self.max_entries:]
+        self._embeddings = embeddings[len(embeddings) - len(entries):].astype(np.float32)
+        self._entries = entries
+        self._exact = {entry["key"]: i for i, entry in enumerate(entries)}
+        self._refresh()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        """Convert to a unit-length float32 array so dot product equals cosine."""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
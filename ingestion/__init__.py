@@ -1,6 +1,18 @@
 """Document ingestion module."""
 
-from .document_processor import DocumentProcessor
-from .embeddings import EmbeddingGenerator
+from importlib import import_module
 
-__all__ = ["DocumentProcessor", "EmbeddingGenerator"]
+# Exports are imported on first access, so importing one submodule (e.g.,
+# the document processor for stats) does not load the embedding backends
+_EXPORTS = {
+    "DocumentProcessor": ".document_processor",
+    "EmbeddingGenerator": ".embeddings"
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,24 +3,71 @@ Document processing and ingestion module.
 This module handles loading, chunking, metadata extraction, and storage.
 """
 
+import itertools
 import os
-from typing import List, Dict
-from pathlib import Path
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Dict, Optional
 from tqdm import tqdm
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from pymongo import MongoClient
-
-from config import MONGODB_URI, MONGODB_DATABASE, MONGODB_COLLECTION, CHUNK_SIZE, CHUNK_OVERLAP, TEAM_PATTERNS
-from utils.pdf_loader import load_pdf_with_metadata, merge_pages
-from utils.metadata_extractor import (
-    extract_metadata_from_filename,
-    extract_provider_name,
-    extract_jira_metadata,
-    extract_confluence_metadata
+from pymongo import ASCENDING, UpdateOne
+from pymongo.write_concern import WriteConcern
+
+from config import (
+    MONGODB_DATABASE,
+    MONGODB_COLLECTION,
+    MONGODB_STATS_COLLECTION,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    TEXT_SPLITTER,
+    INGEST_WORKERS,
+    INGEST_FLUSH_CHUNKS,
+    METADATA_HEAD_CHARS,
+    TEAM_PATTERNS
 )
-from ingestion.embeddings import EmbeddingGenerator
+from generation.sem_cache import clear_semantic_cache
+from mongo_client import get_mongo_client
+from utils.pdf_loader import iter_pdf_files, iter_pdf_pages, merge_pages
+from utils.metadata_extractor import extract_metadata_from_filename, extract_all_metadata
+from utils.hashing import hash_file, hash_text
+from utils.vectors import encode_embedding
+
+
+class _RustTextSplitter:
+    """Adapts semantic_text_splitter.TextSplitter to the split_text interface."""
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        from semantic_text_splitter import TextSplitter
+        self._splitter = TextSplitter(capacity=chunk_size, overlap=chunk_overlap)
+
+    def split_text(self, text: str) -> List[str]:
+        return self._splitter.chunks(text)
+
+
+def build_text_splitter():
+    """
+    Build the text splitter selected by TEXT_SPLITTER.
+
+    Falls back to LangChain's RecursiveCharacterTextSplitter when the Rust
+    splitter is requested but semantic-text-splitter is not installed.
+
+    Returns:
+        Splitter exposing split_text(text) -> List[str]
+    """
+    if TEXT_SPLITTER == "rust":
+        try:
+            return _RustTextSplitter(CHUNK_SIZE, CHUNK_OVERLAP)
+        except ImportError:
+            print("semantic-text-splitter not installed, using RecursiveCharacterTextSplitter")
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
 
 
 class DocumentProcessor:
@@ -28,140 +75,353 @@ class DocumentProcessor:
 
     def __init__(self, embedding_provider: str = "openai"):
         """Initialize document processor with MongoDB and OpenAI clients."""
-        self.client = MongoClient(MONGODB_URI)
+        self.client = get_mongo_client()
         self.db = self.client[MONGODB_DATABASE]
         self.collection = self.db[MONGODB_COLLECTION]
+        # Chunk writes are acknowledged by the primary without waiting for the
+        # journal; an interrupted file is re-processed on the next run anyway
+        # (see process_document)
+        self.ingest_collection = self.collection.with_options(
+            write_concern=WriteConcern(w=1, j=False)
+        )
+        self.stats_collection = self.db[MONGODB_STATS_COLLECTION]
+        # Indexes are created before the first write (see _ensure_indexes),
+        # so stats and clear operations skip the round-trips
+        self._indexes_ready = False
 
-        # Initialize embedding generator
-        self.embedding_generator = EmbeddingGenerator(provider=embedding_provider)
+        # Content hashes handled by this processor, so byte-identical files
+        # in one run are ingested once instead of racing on the same chunks
+        self._claimed_hashes = set()
+        self._claim_lock = threading.Lock()
 
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+        # Embedding generator is created on first use (see embedding_generator)
+        self.embedding_provider = embedding_provider
+        self._embedding_generator = None
+
+        self.text_splitter = build_text_splitter()
 
-    def process_directory(self, directory_path: str) -> int:
+    @property
+    def embedding_generator(self):
+        """
+        Embedding generator, created on first access.
+
+        Importing and initializing the embedding backend (OpenAI SDK, or
+        PyTorch for local embeddings) is slow, so stats and clear operations
+        never pay for it.
+        """
+        if self._embedding_generator is None:
+            from ingestion.embeddings import get_embedding_generator
+            self._embedding_generator = get_embedding_generator(self.embedding_provider)
+        return self._embedding_generator
+
+    def process_directory(self, directory_path: str, max_workers: Optional[int] = None) -> int:
         """
         Process all PDFs in a directory (including subdirectories).
 
+        Files are processed concurrently by INGEST_WORKERS threads so that
+        embedding requests and MongoDB writes of different files overlap.
+
         Args:
             directory_path: Path to directory containing PDFs
+            max_workers: Number of worker threads (defaults to INGEST_WORKERS)
 
         Returns:
             Number of documents processed
         """
-        pdf_files = list(Path(directory_path).rglob("*.pdf"))
-        print(f"Found {len(pdf_files)} PDF files to process")
-
         processed_count = 0
-
-        for pdf_path in tqdm(pdf_files, desc="Processing PDFs"):
-            try:
-                self.process_document(str(pdf_path))
-                processed_count += 1
-            except Exception as e:
-                print(f"\nError processing {pdf_path}: {e}")
-
-        print(f"\nSuccessfully processed {processed_count}/{len(pdf_files)} documents")
+        failed_count = 0
+        inserted_any = False
+        max_workers = max_workers or INGEST_WORKERS
+        self._ensure_indexes()
+
+        # Files are discovered lazily and at most 2 * max_workers are queued,
+        # so memory stays constant regardless of directory size
+        with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                tqdm(desc="Processing PDFs", unit="file") as progress:
+            pending = {}
+
+            def collect(done):
+                nonlocal processed_count, failed_count, inserted_any
+                for future in done:
+                    pdf_path = pending.pop(future)
+                    try:
+                        inserted_any |= bool(future.result())
+                        processed_count += 1
+                    except Exception as e:
+                        failed_count += 1
+                        print(f"\nError processing {pdf_path}: {e}")
+                    progress.update()
+
+            for pdf_path in iter_pdf_files(directory_path):
+                if len(pending) >= 2 * max_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending[executor.submit(self.process_document, pdf_path)] = pdf_path
+
+            collect(wait(pending).done)
+
+        # Cached answers were generated without the new documents
+        if inserted_any:
+            clear_semantic_cache()
+
+        print(f"\nSuccessfully processed {processed_count}/{processed_count + failed_count} documents")
         return processed_count
 
     def process_document(self, file_path: str) -> List[str]:
         """
         Process a single document: load, extract metadata, chunk, embed, store.
 
+        Files whose content hash is already fully ingested, or was already
+        handled by this processor (a duplicate file), are skipped, so
+        re-running ingestion over the same directory is cheap. Pages are
+        streamed: only the leading pages (up to METADATA_HEAD_CHARS)
+        are held together for metadata extraction, and chunks are embedded and
+        written every INGEST_FLUSH_CHUNKS chunks, so memory stays bounded by a
+        page plus one buffer regardless of document size.
+
         Args:
             file_path: Path to PDF file
 
         Returns:
-            List of inserted document IDs
+            List of inserted document IDs (empty if the file was already ingested)
         """
         filename = os.path.basename(file_path)
-
-        # Step 1: Load PDF
-        documents = load_pdf_with_metadata(file_path)
-        full_content = merge_pages(documents)
+        self._ensure_indexes()
+
+        # Step 0: Skip unchanged files. total_chunks is only set once every
+        # chunk is stored, so a doc without it marks an interrupted run.
+        content_hash = hash_file(file_path)
+        with self._claim_lock:
+            if content_hash in self._claimed_hashes:
+                return []
+            self._claimed_hashes.add(content_hash)
+
+        if self.collection.count_documents({
+            "metadata.content_hash": content_hash,
+            "metadata.chunk_index": 0,
+            "metadata.total_chunks": {"$exists": True}
+        }, limit=1):
+            return []
+        self.ingest_collection.delete_many({"metadata.content_hash": content_hash})
+
+        # Step 1: Load the leading pages (headers and provider live at the top)
+        pages = iter_pdf_pages(file_path)
+        head_pages = []
+        head_chars = 0
+        for page in pages:
+            head_pages.append(page)
+            head_chars += len(page.page_content)
+            if head_chars >= METADATA_HEAD_CHARS:
+                break
+        head_content = merge_pages(head_pages)[:METADATA_HEAD_CHARS]
+        first_page = next((page.page_content for page in head_pages if page.page_content.strip()), "")
 
         # Step 2: Extract base metadata from filename
         base_metadata = extract_metadata_from_filename(filename)
+        base_metadata["content_hash"] = content_hash
 
-        # Step 3: Extract provider name using Claude
-        provider_name = extract_provider_name(full_content, filename)
-        if provider_name:
-            base_metadata["provider_name"] = provider_name
+        # Step 3: Extract provider name (one LLM call) and document-type specific metadata
+        base_metadata.update(extract_all_metadata(
+            head_content,
+            filename,
+            document_type=base_metadata["document_type"],
+            provider_content=first_page
+        ))
 
-        # Step 4: Extract document-type specific metadata
-        if base_metadata["document_type"] == "jira":
-            jira_meta = extract_jira_metadata(full_content)
-            base_metadata.update(jira_meta)
-        elif base_metadata["document_type"] == "confluence":
-            confluence_meta = extract_confluence_metadata(full_content)
-            base_metadata.update(confluence_meta)
+        # Step 4: Chunk page by page, embedding and storing in bounded batches
+        inserted_ids = []
+        buffer = []
+        for page in itertools.chain(head_pages, pages):
+            buffer.extend(self.text_splitter.split_text(page.page_content))
+            if len(buffer) >= INGEST_FLUSH_CHUNKS:
+                inserted_ids.extend(self._store_chunks(buffer, base_metadata, len(inserted_ids)))
+                buffer = []
+
+        if buffer:
+            inserted_ids.extend(self._store_chunks(buffer, base_metadata, len(inserted_ids)))
+
+        if not inserted_ids:
+            return []
+
+        # Step 5: The chunk count is only known once every page has been read
+        self.ingest_collection.update_many(
+            {"metadata.content_hash": content_hash},
+            {"$set": {"metadata.total_chunks": len(inserted_ids)}}
+        )
 
-        # Step 5: Chunk the document
-        chunks = self.text_splitter.split_text(full_content)
+        self._update_stats(base_metadata, len(inserted_ids))
 
-        # Step 6: Generate embeddings and store
-        inserted_ids = []
-        for i, chunk in enumerate(chunks):
-            # Generate embedding
-            embedding = self.embedding_generator.generate_embedding(chunk)
+        return [str(_id) for _id in inserted_ids]
 
-            doc_metadata = base_metadata.copy()
-            doc_metadata["chunk_index"] = i
-            doc_metadata["total_chunks"] = len(chunks)
+    def _store_chunks(self, chunks: List[str], base_metadata: Dict, start_index: int) -> List:
+        """
+        Embed a batch of chunks and store them with a single bulk write.
+
+        Repeated boilerplate (headers, footers, legal text) is embedded only
+        once: chunks whose text hash is already stored with the same embedding
+        model reuse that embedding, and duplicates within the batch are sent
+        to the API a single time.
+
+        Args:
+            chunks: Text chunks
+            base_metadata: Document-level metadata shared by every chunk
+            start_index: chunk_index of the first chunk in the batch
+
+        Returns:
+            Inserted ObjectIds, in chunk order
+        """
+        hashes = [hash_text(chunk) for chunk in chunks]
+
+        # Embeddings are only reusable within the same vector space
+        embedder = self.embedding_generator
+        embedding_model = f"{embedder.provider}:{embedder.model_name}:{embedder.dimensions}"
+
+        # Stored embedding fields (already in storage format) keyed by chunk hash
+        embedding_fields = {
+            doc["metadata"]["chunk_hash"]: {
+                key: doc[key] for key in ("embedding", "embedding_scale") if key in doc
+            }
+            for doc in self.collection.find(
+                {
+                    "metadata.chunk_hash": {"$in": list(set(hashes))},
+                    "metadata.embedding_model": embedding_model
+                },
+                {"metadata.chunk_hash": 1, "embedding": 1, "embedding_scale": 1}
+            )
+        }
+
+        new_chunks = {}
+        for chunk, chunk_hash in zip(chunks, hashes):
+            if chunk_hash not in embedding_fields:
+                new_chunks.setdefault(chunk_hash, chunk)
+
+        if new_chunks:
+            embeddings = embedder.generate_embeddings_batch(list(new_chunks.values()))
+            for chunk_hash, embedding in zip(new_chunks, embeddings):
+                embedding_fields[chunk_hash] = encode_embedding(embedding)
 
-            doc_to_insert = {
+        docs_to_insert = [
+            {
                 "content": chunk,
-                "metadata": doc_metadata,
-                "embedding": embedding
+                "metadata": {
+                    **base_metadata,
+                    "chunk_index": i,
+                    "chunk_hash": chunk_hash,
+                    "embedding_model": embedding_model
+                },
+                **embedding_fields[chunk_hash]
             }
+            for i, (chunk, chunk_hash) in enumerate(zip(chunks, hashes), start=start_index)
+        ]
+
+        result = self.ingest_collection.insert_many(docs_to_insert, ordered=False)
+        return result.inserted_ids
+
+    def _ensure_indexes(self):
+        """Create the regular (non-search) indexes used by ingestion, once per processor."""
+        if self._indexes_ready:
+            return
+
+        # One chunk per (file content, position): makes re-ingestion idempotent.
+        # Partial so documents ingested before content hashing don't collide.
+        self.collection.create_index(
+            [("metadata.content_hash", ASCENDING), ("metadata.chunk_index", ASCENDING)],
+            name="content_hash_chunk",
+            unique=True,
+            partialFilterExpression={"metadata.content_hash": {"$exists": True}}
+        )
+
+        # Lookup of already-embedded chunk texts
+        self.collection.create_index([
+            ("metadata.chunk_hash", ASCENDING),
+            ("metadata.embedding_model", ASCENDING)
+        ])
+
+        # Metadata fields used by filters and analytics
+        for field in ("metadata.document_type", "metadata.team", "metadata.provider_name"):
+            self.collection.create_index(field)
+
+        # Provider lookups, optionally narrowed by document type (get_by_provider)
+        self.collection.create_index([
+            ("metadata.provider_name", ASCENDING),
+            ("metadata.document_type", ASCENDING)
+        ])
+
+        # Covers the Jira team/provider analytics ($match on document_type, then group)
+        self.collection.create_index([
+            ("metadata.document_type", ASCENDING),
+            ("metadata.team", ASCENDING),
+            ("metadata.provider_name", ASCENDING)
+        ])
+
+        self._indexes_ready = True
 
-            result = self.collection.insert_one(doc_to_insert)
-            inserted_ids.append(str(result.inserted_id))
+    def _update_stats(self, metadata: Dict, chunk_count: int):
+        """
+        Increment the materialized counters for a newly ingested document.
+
+        Counters are keyed "total", "type:<document_type>", and for Jira
+        tickets "team:<team>", "provider:<provider_name>" and "prefix:<prefix>",
+        matching what the analytics queries count (see utils.stats, which
+        rebuilds them when they fall out of sync with the collection).
 
-        return inserted_ids
+        Args:
+            metadata: Base metadata of the document
+            chunk_count: Number of chunks inserted
+        """
+        if not chunk_count:
+            return
+
+        keys = ["total"]
+        if metadata.get("document_type"):
+            keys.append(f"type:{metadata['document_type']}")
+
+        if metadata.get("document_type") == "jira":
+            if metadata.get("team"):
+                keys.append(f"team:{metadata['team']}")
+            if metadata.get("provider_name"):
+                keys.append(f"provider:{metadata['provider_name']}")
+            if metadata.get("source_id"):
+                keys.append(f"prefix:{metadata['source_id'].rsplit('-', 1)[0]}")
+
+        self.stats_collection.bulk_write([
+            UpdateOne({"_id": key}, {"$inc": {"count": chunk_count}}, upsert=True)
+            for key in keys
+        ])
 
     def clear_collection(self):
         """Clear all documents from the collection."""
         result = self.collection.delete_many({})
+        self.stats_collection.delete_many({})
+        # Cached answers refer to the deleted documents
+        clear_semantic_cache()
         print(f"Deleted {result.deleted_count} documents from collection")
 
     def get_stats(self) -> Dict:
         """
         Get statistics about the document collection.
 
+        The total comes from collection metadata (O(1)); the breakdowns are
+        computed in a single $facet aggregation round-trip.
+
         Returns:
             Dictionary with collection statistics
         """
-        total_docs = self.collection.count_documents({})
-
-        # Count by document type
-        jira_count = self.collection.count_documents({"metadata.document_type": "jira"})
-        confluence_count = self.collection.count_documents({"metadata.document_type": "confluence"})
-
-        # Count by team
-        team_counts = {}
-        for team in TEAM_PATTERNS.values():
-            count = self.collection.count_documents({"metadata.team": team})
-            if count > 0:
-                team_counts[team] = count
-
-        # Count by provider
-        providers = self.collection.distinct("metadata.provider_name")
-        provider_counts = {}
-        for provider in providers:
-            if provider:
-                count = self.collection.count_documents({"metadata.provider_name": provider})
-                provider_counts[provider] = count
+        stats = next(self.collection.aggregate([{"$facet": {
+            "by_type": [{"$group": {"_id": "$metadata.document_type", "n": {"$sum": 1}}}],
+            "by_team": [{"$group": {"_id": "$metadata.team", "n": {"$sum": 1}}}],
+            "by_provider": [{"$group": {"_id": "$metadata.provider_name", "n": {"$sum": 1}}}]
+        }}]))
+
+        by_type = {item["_id"]: item["n"] for item in stats["by_type"]}
+        known_teams = set(TEAM_PATTERNS.values())
 
         return {
-            "total_documents": total_docs,
-            "jira_documents": jira_count,
-            "confluence_documents": confluence_count,
-            "teams": team_counts,
-            "providers": provider_counts
+            "total_documents": self.collection.estimated_document_count(),
+            "jira_documents": by_type.get("jira", 0),
+            "confluence_documents": by_type.get("confluence", 0),
+            "teams": {item["_id"]: item["n"] for item in stats["by_team"] if item["_id"] in known_teams},
+            "providers": {item["_id"]: item["n"] for item in stats["by_provider"] if item["_id"]}
         }
 
 
@@ -6,9 +6,69 @@ This module uses OpenAI embeddings as the standard choice for RAG systems.
 Alternative: You can use Voyage AI or local models like sentence-transformers.
 """
 
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterator, List, Tuple
 import os
 
+from config import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BATCH_MAX_TOKENS,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_DEVICE,
+    EMBEDDING_DIMENSIONS
+)
+from utils.rate_limit import embedding_rate_limiter
+from utils.retry import call_with_backoff
+from utils.tokens import count_tokens, count_tokens_batch
+
+# Hard limit on inputs per OpenAI embeddings request
+OPENAI_MAX_BATCH_INPUTS = 2048
+
+# Texts per forward pass for local sentence-transformers encoding
+LOCAL_ENCODE_BATCH_SIZE = 64
+
+
+def iter_sub_batches(texts: List[str]) -> Iterator[Tuple[List[str], int]]:
+    """
+    Split texts into embedding request batches.
+
+    A batch is closed when it reaches EMBEDDING_BATCH_SIZE texts or when
+    adding the next text would exceed EMBEDDING_BATCH_MAX_TOKENS.
+
+    Args:
+        texts: Input texts, in order
+
+    Yields:
+        (sub-list of texts, its token count) tuples, in order
+    """
+    max_size = min(EMBEDDING_BATCH_SIZE, OPENAI_MAX_BATCH_INPUTS)
+    batch = []
+    batch_tokens = 0
+
+    for text, n_tokens in zip(texts, count_tokens_batch(texts)):
+        if batch and (len(batch) >= max_size or batch_tokens + n_tokens > EMBEDDING_BATCH_MAX_TOKENS):
+            yield batch, batch_tokens
+            batch = []
+            batch_tokens = 0
+
+        batch.append(text)
+        batch_tokens += n_tokens
+
+    if batch:
+        yield batch, batch_tokens
+
+
+@lru_cache(maxsize=1)
+def _request_executor() -> ThreadPoolExecutor:
+    """
+    Return the process-wide pool that sends OpenAI embedding requests.
+
+    Shared by all callers (e.g., concurrent ingest workers), so at most
+    EMBEDDING_CONCURRENCY requests are in flight in the process.
+    """
+    return ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY, thread_name_prefix="embeddings")
+
 
 class EmbeddingGenerator:
     """
@@ -50,13 +110,18 @@ class EmbeddingGenerator:
     def _init_openai(self):
         """Initialize OpenAI embeddings."""
         try:
-            from openai import OpenAI
+            from llm_client import get_client
             api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
                 raise ValueError("OPENAI_API_KEY not found in environment")
-            self.client = OpenAI(api_key=api_key)
+            # Shared HTTP/2 client: connections stay warm across generators and components
+            self.client = get_client()
             self.model = "text-embedding-3-small"
-            print(f"Initialized OpenAI embeddings with model: {self.model}")
+            self.model_name = self.model
+            self.dimensions = EMBEDDING_DIMENSIONS or 1536
+            # Matryoshka truncation is done server-side (vectors come back re-normalized)
+            self.request_options = {"dimensions": EMBEDDING_DIMENSIONS} if EMBEDDING_DIMENSIONS else {}
+            print(f"Initialized OpenAI embeddings with model: {self.model} ({self.dimensions} dims)")
         except ImportError:
             raise ImportError("OpenAI package not installed. Run: pip install openai")
 
@@ -69,6 +134,8 @@ class EmbeddingGenerator:
                 raise ValueError("VOYAGE_API_KEY not found in environment")
             self.client = voyageai.Client(api_key=api_key)
             self.model = "voyage-2"
+            self.model_name = self.model
+            self.dimensions = 1024
             print(f"Initialized Voyage AI embeddings with model: {self.model}")
         except ImportError:
             raise ImportError("VoyageAI package not installed. Run: pip install voyageai")
@@ -77,8 +144,13 @@ class EmbeddingGenerator:
         """Initialize local sentence-transformers embeddings."""
         try:
             from sentence_transformers import SentenceTransformer
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
-            print("Initialized local embeddings with sentence-transformers")
+            self.model_name = "all-MiniLM-L6-v2"
+            self.model = SentenceTransformer(self.model_name, device=EMBEDDING_DEVICE)
+            # Half precision halves memory bandwidth on GPU/MPS; CPUs stay in FP32
+            if self.model.device.type in ("cuda", "mps"):
+                self.model.half()
+            self.dimensions = self.model.get_sentence_embedding_dimension()
+            print(f"Initialized local embeddings with sentence-transformers on {self.model.device}")
         except ImportError:
             raise ImportError(
                 "sentence-transformers not installed. Run: pip install sentence-transformers"
@@ -95,9 +167,12 @@ class EmbeddingGenerator:
             Embedding vector as list of floats
         """
         if self.provider == "openai":
-            response = self.client.embeddings.create(
+            embedding_rate_limiter.acquire(count_tokens(text))
+            response = call_with_backoff(
+                self.client.embeddings.create,
                 model=self.model,
-                input=text
+                input=text,
+                **self.request_options
             )
             return response.data[0].embedding
 
@@ -106,33 +181,78 @@ class EmbeddingGenerator:
             return result.embeddings[0]
 
         elif self.provider == "local":
-            embedding = self.model.encode(text)
+            embedding = self.model.encode(text, normalize_embeddings=True)
             return embedding.tolist()
 
     def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for multiple texts in batch.
 
+        API texts are split into sub-batches (see iter_sub_batches). For
+        OpenAI the sub-batches are sent concurrently from a shared thread
+        pool over the shared HTTP/2 client, so no connection setup is repeated
+        per call. Local embeddings are encoded in a single batched call.
+
         Args:
             texts: List of input texts
 
         Returns:
-            List of embedding vectors
+            List of embedding vectors, in input order
         """
+        if not texts:
+            return []
+
         if self.provider == "openai":
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=texts
+            results = _request_executor().map(
+                lambda sub_batch: self._embed_openai_batch(*sub_batch),
+                iter_sub_batches(texts)
             )
-            return [item.embedding for item in response.data]
+            return [embedding for batch in results for embedding in batch]
 
-        elif self.provider == "voyage":
-            result = self.client.embed(texts, model=self.model)
-            return result.embeddings
+        if self.provider == "local":
+            # One encode call batches the forward passes; stored vectors stay FP32
+            embeddings = self.model.encode(
+                texts,
+                batch_size=LOCAL_ENCODE_BATCH_SIZE,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+            return embeddings.astype("float32").tolist()
 
-        elif self.provider == "local":
-            embeddings = self.model.encode(texts)
-            return [emb.tolist() for emb in embeddings]
+        embeddings = []
+        for batch, _ in iter_sub_batches(texts):
+            embeddings.extend(self.client.embed(batch, model=self.model).embeddings)
+
+        return embeddings
+
+    def _embed_openai_batch(self, batch: List[str], n_tokens: int) -> List[List[float]]:
+        """Embed one sub-batch, waiting for rate-limit capacity and retrying transient errors."""
+        embedding_rate_limiter.acquire(n_tokens)
+        response = call_with_backoff(
+            self.client.embeddings.create,
+            model=self.model,
+            input=batch,
+            **self.request_options
+        )
+        return [item.embedding for item in response.data]
+
+
+@lru_cache(maxsize=None)
+def get_embedding_generator(provider: str = "openai") -> EmbeddingGenerator:
+    """
+    Return the process-wide embedding generator for a provider.
+
+    Loading a provider (API client setup, or a sentence-transformers model)
+    is expensive, so the retriever and document processor share one instance.
+
+    Args:
+        provider: Either 'openai', 'voyage', or 'local'
+
+    Returns:
+        Shared EmbeddingGenerator
+    """
+    return EmbeddingGenerator(provider=provider)
 
 
 # Example usage
@@ -0,0 +1,56 @@
+"""
+Shared OpenAI clients for the Yuno RAG Pipeline.
+
+Every OpenAI() instance builds its own HTTPX connection pool and TLS context.
+The generator, evaluators and embeddings share these process-wide clients
+instead, so connections stay warm across components. Connections use HTTP/2,
+which multiplexes concurrent requests over a single TLS connection.
+"""
+
+from functools import lru_cache
+
+import httpx
+from openai import OpenAI
+
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    LOCAL_GENERATION_URL,
+    LOCAL_GENERATION_API_KEY
+)
+
+
+def _limits() -> httpx.Limits:
+    """Connection pool limits shared by the OpenAI and local clients."""
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS
+    )
+
+
+@lru_cache(maxsize=1)
+def get_client() -> OpenAI:
+    """Return the process-wide synchronous OpenAI client."""
+    return OpenAI(
+        api_key=OPENAI_API_KEY,
+        http_client=httpx.Client(http2=True, limits=_limits())
+    )
+
+
+@lru_cache(maxsize=1)
+def get_local_client() -> OpenAI:
+    """
+    Return the client for the local OpenAI-compatible generation endpoint.
+
+    Raises:
+        ValueError: If LOCAL_GENERATION_URL is not configured
+    """
+    if not LOCAL_GENERATION_URL:
+        raise ValueError("LOCAL_GENERATION_URL not found in environment")
+
+    return OpenAI(
+        base_url=LOCAL_GENERATION_URL,
+        api_key=LOCAL_GENERATION_API_KEY,
+        http_client=httpx.Client(http2=True, limits=_limits())
+    )
@@ -12,9 +12,11 @@ import json
 from pathlib import Path
 
 from ingestion.document_processor import DocumentProcessor
-from generation.generator import ResponseGenerator
-from evals.precision import PrecisionEvaluator
-from evals.groundedness import GroundednessEvaluator
+from retrieval.index import ensure_vector_index
+
+# Generation and evaluation modules pull in the OpenAI SDK and embedding
+# backends; they are imported inside the commands that need them so that
+# lightweight commands (e.g., stats) start fast.
 
 
 def ingest_documents(data_dir: str, clear: bool = False, embedding_provider: str = "openai"):
@@ -36,6 +38,8 @@ def ingest_documents(data_dir: str, clear: bool = False, embedding_provider: str
         print("⚠️  Clearing existing collection...")
         processor.clear_collection()
 
+    ensure_vector_index(processor.collection, processor.embedding_generator.dimensions)
+
     print(f"📂 Processing documents from: {data_dir}")
     processor.process_directory(data_dir)
 
@@ -44,6 +48,12 @@ def ingest_documents(data_dir: str, clear: bool = False, embedding_provider: str
     print(json.dumps(stats, indent=2))
 
 
+def show_stats():
+    """Print collection statistics (no embedding backend is loaded)."""
+    processor = DocumentProcessor()
+    print(json.dumps(processor.get_stats(), indent=2))
+
+
 def query_system(query: str, embedding_provider: str = "openai"):
     """
     Query the RAG system.
@@ -58,6 +68,8 @@ def query_system(query: str, embedding_provider: str = "openai"):
 
     print(f"❓ Query: {query}\n")
 
+    from generation.generator import ResponseGenerator
+
     generator = ResponseGenerator(embedding_provider=embedding_provider)
 
     # Use smart query routing
@@ -91,6 +103,10 @@ def run_evaluation(embedding_provider: str = "openai"):
     print("RUNNING EVALUATIONS")
     print(f"{'='*60}\n")
 
+    from generation.generator import ResponseGenerator
+    from evals.precision import PrecisionEvaluator
+    from evals.groundedness import GroundednessEvaluator
+
     generator = ResponseGenerator(embedding_provider=embedding_provider)
     precision_eval = PrecisionEvaluator()
     groundedness_eval = GroundednessEvaluator()
@@ -116,8 +132,9 @@ def run_evaluation(embedding_provider: str = "openai"):
         print(f"\n[{i}/{len(test_queries)}] Query: {query}")
         print("-" * 60)
 
-        # Get response using smart routing (handles both semantic and analytical queries)
-        result = generator.query_with_analytics(query)
+        # Get response using smart routing (handles both semantic and analytical
+        # queries); bypass the semantic cache so every answer is freshly generated
+        result = generator.query_with_analytics(query, use_cache=False)
 
         # Check if it's an analytical query (no semantic search needed)
         if result.get("query_type") == "analytical":
@@ -129,8 +146,8 @@ def run_evaluation(embedding_provider: str = "openai"):
             print("⚠️  No documents retrieved, skipping evaluation")
             continue
 
-        # Retrieve context docs for semantic queries
-        context_docs = generator.retriever.semantic_search(query, top_k=5)
+        # Evaluate against the documents the answer was generated from
+        context_docs = result["context_docs"]
 
         # Evaluate Precision
         precision_result = precision_eval.evaluate(query, context_docs)
@@ -142,8 +159,12 @@ def run_evaluation(embedding_provider: str = "openai"):
         groundedness_result = groundedness_eval.evaluate(
             query=query,
             generated_answer=result["answer"],
-            context_docs=context_docs[:3]  # Use top 3 for efficiency
+            context_docs=context_docs
         )
+        if groundedness_result["groundedness_score"] is None:
+            print(f"ℹ️  Groundedness: {groundedness_result['verdict']}")
+            continue
+
         all_groundedness_scores.append(groundedness_result["groundedness_score"])
 
         print(f"✓ Groundedness: {groundedness_result['groundedness_score']:.2f} ({groundedness_result['verdict']})")
@@ -177,6 +198,8 @@ def interactive_mode(embedding_provider: str = "openai"):
 
     print("Type your questions (or 'quit' to exit)\n")
 
+    from generation.generator import ResponseGenerator
+
     generator = ResponseGenerator(embedding_provider=embedding_provider)
 
     while True:
@@ -231,6 +254,9 @@ def main():
     eval_parser.add_argument("--embedding-provider", default="openai", choices=["local", "openai", "voyage"],
                             help="Embedding provider to use")
 
+    # Stats command
+    subparsers.add_parser("stats", help="Show collection statistics")
+
     # Interactive command
     interactive_parser = subparsers.add_parser("interactive", help="Interactive query mode")
     interactive_parser.add_argument("--embedding-provider", default="openai", choices=["local", "openai", "voyage"],
@@ -247,6 +273,9 @@ def main():
     elif args.command == "eval":
         run_evaluation(args.embedding_provider)
 
+    elif args.command == "stats":
+        show_stats()
+
     elif args.command == "interactive":
         interactive_mode(args.embedding_provider)
 
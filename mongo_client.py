@@ -0,0 +1,27 @@
+"""
+Shared MongoDB client for the Yuno RAG Pipeline.
+
+Every MongoClient opens its own connection pool and runs the server handshake
+on first use. The retriever and document processor share this process-wide
+client instead, so creating them per request or per script stays cheap.
+"""
+
+from functools import lru_cache
+
+from pymongo import MongoClient
+
+from config import (
+    MONGODB_URI,
+    MONGODB_MAX_POOL_SIZE,
+    MONGODB_COMPRESSORS
+)
+
+
+@lru_cache(maxsize=1)
+def get_mongo_client() -> MongoClient:
+    """Return the process-wide MongoDB client (thread-safe, pooled, compressed)."""
+    return MongoClient(
+        MONGODB_URI,
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        compressors=MONGODB_COMPRESSORS
+    )
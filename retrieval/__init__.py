@@ -1,5 +1,17 @@
 """Retrieval module for querying documents."""
 
-from .retriever import HybridRetriever
+from importlib import import_module
 
-__all__ = ["HybridRetriever"]
+# Exports are imported on first access, so importing retrieval.index does not
+# load the retriever (embedding backends, numba)
+_EXPORTS = {
+    "HybridRetriever": ".retriever"
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -8,12 +8,193 @@ This retriever supports:
 4. Cross-document retrieval (Jira + Confluence)
 """
 
-from typing import List, Dict, Optional, Any
-from pymongo import MongoClient
+import time
+from functools import lru_cache
+from typing import List, Dict, Optional, Any, Callable, Tuple
 import numpy as np
 
-from config import MONGODB_URI, MONGODB_DATABASE, MONGODB_COLLECTION, TOP_K, SIMILARITY_THRESHOLD
-from ingestion.embeddings import EmbeddingGenerator
+from config import (
+    MONGODB_DATABASE,
+    MONGODB_COLLECTION,
+    MONGODB_STATS_COLLECTION,
+    VECTOR_INDEX_NAME,
+    TOP_K,
+    SIMILARITY_THRESHOLD,
+    NUM_CANDIDATES_FACTOR,
+    MIN_NUM_CANDIDATES,
+    ANALYTICS_CACHE_TTL,
+    QUERY_EMBEDDING_CACHE_SIZE
+)
+from ingestion.embeddings import get_embedding_generator
+from mongo_client import get_mongo_client
+from retrieval.index import FILTER_FIELDS
+from utils.stats import counters_in, load_counters
+from utils.vectors import decode_embedding, encode_query_vector, normalize
+
+# Row norms further than this from 1 are renormalized before MMR
+UNIT_NORM_TOLERANCE = 1e-3
+
+# Upper bound Atlas accepts for $vectorSearch numCandidates
+MAX_NUM_CANDIDATES = 10000
+
+# Fields returned by metadata lookups; leaves the (large) embedding on the server
+DOCUMENT_PROJECTION = {"content": 1, "metadata": 1}
+
+
+@lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+def _cached_query_embedding(provider: str, model_name: str, dimensions: int, query: str) -> Tuple[float, ...]:
+    """
+    Embed a normalized query, memoized per embedding model.
+
+    The key includes the model name and dimensions so a model change never
+    returns vectors from a different embedding space. Failed calls are not cached.
+    """
+    return tuple(get_embedding_generator(provider).generate_embedding(query))
+
+
+# Query operators $vectorSearch.filter accepts on indexed filter fields
+_VECTOR_FILTER_OPERATORS = {"$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin"}
+_VECTOR_FILTER_VALUE_TYPES = (str, bool, int, float)
+
+
+def _num_candidates(limit: int) -> int:
+    """HNSW candidates to explore for a $vectorSearch limit (work scales with this)."""
+    return min(max(NUM_CANDIDATES_FACTOR * limit, MIN_NUM_CANDIDATES), MAX_NUM_CANDIDATES)
+
+
+def _is_vector_filter_clause(key: str, value: Any) -> bool:
+    """Check whether a single filter clause can run inside $vectorSearch."""
+    if key in ("$and", "$or"):
+        return isinstance(value, list) and all(
+            isinstance(clause, dict) and all(_is_vector_filter_clause(k, v) for k, v in clause.items())
+            for clause in value
+        )
+
+    if key not in FILTER_FIELDS:
+        return False
+
+    if isinstance(value, _VECTOR_FILTER_VALUE_TYPES):
+        return True
+
+    if isinstance(value, dict):
+        return bool(value) and all(
+            op in _VECTOR_FILTER_OPERATORS and (
+                all(isinstance(v, _VECTOR_FILTER_VALUE_TYPES) for v in operand)
+                if op in ("$in", "$nin") and isinstance(operand, list)
+                else isinstance(operand, _VECTOR_FILTER_VALUE_TYPES)
+            )
+            for op, operand in value.items()
+        )
+
+    return False
+
+
+def _split_filters(filters: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Split metadata filters into a $vectorSearch pre-filter and a post-$match.
+
+    Clauses on the index's filter fields using supported operators are
+    applied during the vector search itself, so limit counts only matching
+    documents; anything else (e.g., $regex, unindexed fields) falls back to
+    a $match after it.
+
+    Args:
+        filters: MongoDB-style filters
+
+    Returns:
+        Tuple of (pre-filter, post-filter); either may be empty
+    """
+    pre_filter, post_filter = {}, {}
+    for key, value in filters.items():
+        target = pre_filter if _is_vector_filter_clause(key, value) else post_filter
+        target[key] = value
+    return pre_filter, post_filter
+
+
+# Optional: JIT-compile the MMR selection loop (pip install numba)
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _mmr_select(
+    relevance: np.ndarray,
+    similarities: np.ndarray,
+    max_sim_bound: np.ndarray,
+    lambda_param: float,
+    top_k: int
+) -> np.ndarray:
+    """
+    Greedy MMR selection over precomputed similarities.
+
+    Candidates that provably cannot be selected are dropped from the working
+    set as selection proceeds. A candidate's score only decreases (its
+    diversity penalty only grows), so its current score is an upper bound;
+    its score with the penalty at max_sim_bound is a lower bound. If, with r
+    slots left, r other candidates have a lower bound above a candidate's
+    upper bound, those r are always picked first and it can be dropped. The
+    selection is identical to the unpruned greedy loop.
+
+    Args:
+        relevance: Cosine similarity of each candidate to the query, shape (N,)
+        similarities: Pairwise cosine similarities of the candidates, shape (N, N)
+        max_sim_bound: Highest similarity of each candidate to any other, shape (N,)
+        lambda_param: Balance between relevance and diversity (0 to 1)
+        top_k: Number of candidates to select
+
+    Returns:
+        Indices of the selected candidates, in selection order
+    """
+    n = relevance.shape[0]
+    k = min(top_k, n)
+    order = np.empty(k, dtype=np.int32)
+
+    # Working set: original indices and per-candidate state of the candidates
+    # still in the running
+    active = np.arange(n)
+    active_relevance = relevance.copy()
+    lower_bounds = lambda_param * relevance - (1 - lambda_param) * max_sim_bound
+
+    # Max similarity of each candidate to the selected set. Starting at -1
+    # (the cosine minimum) shifts every score equally, so the first pick is
+    # the most relevant document, as with an empty selected set.
+    max_sim = np.full(n, -1.0, dtype=np.float32)
+
+    for step in range(k):
+        mmr_scores = lambda_param * active_relevance - (1 - lambda_param) * max_sim
+
+        pos = mmr_scores.argmax()
+        best = active[pos]
+        order[step] = best
+
+        keep = np.ones(active.shape[0], dtype=np.bool_)
+        keep[pos] = False
+
+        # Fold the new selection into the diversity penalty
+        max_sim = np.maximum(max_sim, similarities[best][active])
+
+        remaining = k - step - 1
+        if 0 < remaining < active.shape[0] - 1:
+            upper_bounds = lambda_param * active_relevance - (1 - lambda_param) * max_sim
+            # r-th highest lower bound among the other candidates; ties are
+            # kept since argmax could still pick them
+            others = lower_bounds[keep]
+            cut = others.shape[0] - remaining
+            threshold = np.partition(others, cut)[cut]
+            keep &= upper_bounds >= threshold
+
+        active = active[keep]
+        active_relevance = active_relevance[keep]
+        lower_bounds = lower_bounds[keep]
+        max_sim = max_sim[keep]
+
+    return order
+
+
+if njit is not None:
+    # No fastmath: the masked scores rely on -inf comparisons
+    _mmr_select = njit(cache=True)(_mmr_select)
 
 
 class HybridRetriever:
@@ -26,10 +207,38 @@ class HybridRetriever:
         Args:
             embedding_provider: Embedding provider to use ('openai', 'voyage', 'local')
         """
-        self.client = MongoClient(MONGODB_URI)
+        self.client = get_mongo_client()
         self.db = self.client[MONGODB_DATABASE]
         self.collection = self.db[MONGODB_COLLECTION]
-        self.embedding_generator = EmbeddingGenerator(provider=embedding_provider)
+        self.stats_collection = self.db[MONGODB_STATS_COLLECTION]
+        self.embedding_generator = get_embedding_generator(embedding_provider)
+
+        # Analytics results keyed by name -> (computed_at, value)
+        self._analytics_cache: Dict[str, Tuple[float, Dict]] = {}
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query string.
+
+        Callers that need the query vector for more than one purpose (e.g.,
+        cache lookup and vector search) should call this once and pass the
+        result to semantic_search via query_embedding. Embeddings are cached
+        in memory (LRU of QUERY_EMBEDDING_CACHE_SIZE), keyed by the query with
+        whitespace collapsed.
+
+        Args:
+            query: Query text
+
+        Returns:
+            Query embedding vector
+        """
+        generator = self.embedding_generator
+        return list(_cached_query_embedding(
+            generator.provider,
+            generator.model_name,
+            generator.dimensions,
+            " ".join(query.split())
+        ))
 
     def semantic_search(
         self,
@@ -37,7 +246,8 @@ class HybridRetriever:
         filters: Optional[Dict[str, Any]] = None,
         top_k: int = None,
         use_mmr: bool = True,
-        lambda_param: float = 0.7
+        lambda_param: float = 0.7,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict]:
         """
         Perform semantic search with optional MMR re-ranking and metadata filtering.
@@ -53,6 +263,7 @@ class HybridRetriever:
             lambda_param: MMR balance parameter (default: 0.7)
                          1.0 = only relevance, 0.0 = only diversity
                          Recommended: 0.7 (70% relevance, 30% diversity)
+            query_embedding: Precomputed embedding of query (computed if None)
 
         Returns:
             List of documents with content and metadata
@@ -60,66 +271,78 @@ class HybridRetriever:
         if top_k is None:
             top_k = TOP_K
 
-        # Generate query embedding
-        query_embedding = self.embedding_generator.generate_embedding(query)
+        # Generate query embedding unless the caller already has one
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
 
         # Fetch more candidates for MMR to select from
         # Standard practice: fetch 2-3x more candidates than needed
         fetch_limit = top_k * 3 if use_mmr else top_k
 
+        # Embeddings are only needed for MMR; skipping them otherwise avoids
+        # shipping several KB per candidate
+        project_stage = {
+            "content": 1,
+            "metadata": 1,
+            "score": {"$meta": "vectorSearchScore"}
+        }
+        if use_mmr:
+            project_stage["embedding"] = 1
+            project_stage["embedding_scale"] = 1
+
+        # Supported metadata filters prune the vector search itself; the rest
+        # are applied with a $match afterwards
+        pre_filter, post_filter = _split_filters(filters or {})
+
+        vector_search = {
+            "index": VECTOR_INDEX_NAME,
+            "path": "embedding",
+            "queryVector": encode_query_vector(query_embedding),
+            "numCandidates": _num_candidates(fetch_limit),
+            "limit": fetch_limit
+        }
+        if pre_filter:
+            vector_search["filter"] = pre_filter
+
         # Build MongoDB Atlas Vector Search pipeline
         pipeline = [
-            {
-                "$vectorSearch": {
-                    "index": "vector_index",
-                    "path": "embedding",
-                    "queryVector": query_embedding,
-                    "numCandidates": 100,
-                    "limit": fetch_limit
-                }
-            },
-            {
-                "$project": {
-                    "content": 1,
-                    "metadata": 1,
-                    "embedding": 1,  # Include embedding for MMR calculation
-                    "score": {"$meta": "vectorSearchScore"}
-                }
-            }
+            {"$vectorSearch": vector_search},
+            {"$project": project_stage}
         ]
 
-        # Add metadata filters if provided
-        if filters:
-            # Add $match stage after $vectorSearch for metadata filtering
-            pipeline.append({"$match": filters})
+        if post_filter:
+            pipeline.append({"$match": post_filter})
 
-        # Execute vector search
+        # Execute vector search; all results fit in the first batch. Embeddings
+        # (needed only for MMR) are written into rows of a preallocated matrix,
+        # so result documents never carry them.
         candidates = []
-        for doc in self.collection.aggregate(pipeline):
+        candidate_matrix = None
+        for doc in self.collection.aggregate(pipeline, batchSize=fetch_limit):
+            if use_mmr:
+                embedding = decode_embedding(doc.get("embedding"), doc.get("embedding_scale"))
+                if candidate_matrix is None:
+                    candidate_matrix = np.empty((fetch_limit, embedding.shape[0]), dtype=np.float32)
+                candidate_matrix[len(candidates)] = embedding
+
             candidates.append({
                 "content": doc["content"],
                 "metadata": doc["metadata"],
-                "embedding": doc.get("embedding"),
                 "similarity": doc.get("score", 0.0),
                 "_id": str(doc["_id"])
             })
 
         # Apply MMR re-ranking if enabled
         if use_mmr and len(candidates) > 0:
-            results = self._mmr_rerank(
+            return self._mmr_rerank(
                 query_embedding=query_embedding,
                 candidates=candidates,
+                candidate_matrix=candidate_matrix[:len(candidates)],
                 top_k=top_k,
                 lambda_param=lambda_param
             )
-        else:
-            results = candidates[:top_k]
-
-        # Remove embeddings from final results (not needed in downstream processing)
-        for result in results:
-            result.pop("embedding", None)
 
-        return results
+        return candidates[:top_k]
 
     def get_by_ticket_id(self, ticket_id: str) -> List[Dict]:
         """
@@ -131,7 +354,7 @@ class HybridRetriever:
         Returns:
             List of document chunks
         """
-        documents = list(self.collection.find({"metadata.source_id": ticket_id}))
+        documents = self.collection.find({"metadata.source_id": ticket_id}, projection=DOCUMENT_PROJECTION)
 
         return [
             {
@@ -158,7 +381,7 @@ class HybridRetriever:
         if doc_type:
             filters["metadata.document_type"] = doc_type
 
-        documents = list(self.collection.find(filters))
+        documents = self.collection.find(filters, projection=DOCUMENT_PROJECTION)
 
         return [
             {
@@ -169,44 +392,70 @@ class HybridRetriever:
             for doc in documents
         ]
 
+    def _cached_analytics(self, name: str, compute: Callable[[], Dict]) -> Dict:
+        """
+        Return a memoized analytics result, recomputing it after ANALYTICS_CACHE_TTL seconds.
+
+        Args:
+            name: Cache key for the result
+            compute: Function that runs the aggregation
+
+        Returns:
+            Copy of the cached result
+        """
+        now = time.monotonic()
+        cached = self._analytics_cache.get(name)
+
+        if cached is None or now - cached[0] > ANALYTICS_CACHE_TTL:
+            cached = (now, compute())
+            self._analytics_cache[name] = cached
+
+        return dict(cached[1])
+
     def count_by_team(self) -> Dict[str, int]:
         """
         Count tickets by team.
 
+        Results are cached for ANALYTICS_CACHE_TTL seconds (see count_jira_stats).
+
         Returns:
             Dictionary with team counts
         """
-        pipeline = [
-            {"$match": {"metadata.document_type": "jira"}},
-            {"$group": {
-                "_id": "$metadata.team",
-                "count": {"$sum": 1}
-            }}
-        ]
-
-        results = self.collection.aggregate(pipeline)
-        return {item["_id"]: item["count"] for item in results if item["_id"]}
+        return self.count_jira_stats()["by_team"]
 
     def count_by_provider(self) -> Dict[str, int]:
         """
         Count tickets by provider.
 
+        Results are cached for ANALYTICS_CACHE_TTL seconds (see count_jira_stats).
+
         Returns:
             Dictionary with provider counts
         """
-        pipeline = [
-            {"$match": {
-                "metadata.document_type": "jira",
-                "metadata.provider_name": {"$ne": None}
-            }},
-            {"$group": {
-                "_id": "$metadata.provider_name",
-                "count": {"$sum": 1}
-            }}
-        ]
+        return self.count_jira_stats()["by_provider"]
+
+    def count_jira_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Count tickets by team and by provider.
+
+        Reads the materialized stats counters maintained on ingest; they are
+        rebuilt from the documents in one $facet aggregation when they do not
+        cover the whole collection (see utils.stats). Results are cached for
+        ANALYTICS_CACHE_TTL seconds.
 
-        results = self.collection.aggregate(pipeline)
-        return {item["_id"]: item["count"] for item in results}
+        Returns:
+            Dictionary with "by_team" and "by_provider" counts
+        """
+        stats = self._cached_analytics("count_jira_stats", self._count_jira_stats)
+        return {name: dict(counts) for name, counts in stats.items()}
+
+    def _count_jira_stats(self) -> Dict[str, Dict[str, int]]:
+        """Read team/provider counts from the (validated) stats counters."""
+        counters = load_counters(self.collection, self.stats_collection)
+        return {
+            "by_team": counters_in(counters, "team"),
+            "by_provider": counters_in(counters, "provider")
+        }
 
     def get_providers_with_capability(self, capability: str) -> List[str]:
         """
@@ -218,21 +467,40 @@ class HybridRetriever:
         Returns:
             List of provider names
         """
-        # Search in Confluence documents for the capability
-        results = self.semantic_search(
-            query=capability,
-            filters={"metadata.document_type": "confluence"},
-            top_k=20
-        )
+        # Search in Confluence documents for the capability; 60 candidates is
+        # the pool a top_k=20 MMR search selects from
+        return self._providers_for_query(capability, candidate_limit=60)
+
+    def _providers_for_query(self, query: str, candidate_limit: int) -> List[str]:
+        """
+        Distinct providers of the Confluence chunks nearest to a query.
 
-        # Extract unique providers
-        providers = set()
-        for result in results:
-            provider = result["metadata"].get("provider_name")
-            if provider:
-                providers.add(provider)
+        Grouping runs in the database, so only provider names come back
+        (no content, embeddings or MMR).
 
-        return list(providers)
+        Args:
+            query: Search query text
+            candidate_limit: Number of nearest chunks to consider
+
+        Returns:
+            List of provider names
+        """
+        pipeline = [
+            {
+                "$vectorSearch": {
+                    "index": VECTOR_INDEX_NAME,
+                    "path": "embedding",
+                    "queryVector": encode_query_vector(self.embed_query(query)),
+                    "numCandidates": _num_candidates(candidate_limit),
+                    "limit": candidate_limit,
+                    "filter": {"metadata.document_type": "confluence"}
+                }
+            },
+            {"$group": {"_id": "$metadata.provider_name"}},
+            {"$match": {"_id": {"$nin": [None, ""]}}}
+        ]
+
+        return [doc["_id"] for doc in self.collection.aggregate(pipeline)]
 
     def get_ticket_with_provider_docs(self, ticket_id: str) -> Dict:
         """
@@ -273,6 +541,7 @@ class HybridRetriever:
         self,
         query_embedding: List[float],
         candidates: List[Dict],
+        candidate_matrix: np.ndarray,
         top_k: int,
         lambda_param: float
     ) -> List[Dict]:
@@ -290,7 +559,8 @@ class HybridRetriever:
 
         Args:
             query_embedding: Query vector
-            candidates: Candidate documents with embeddings
+            candidates: Candidate documents
+            candidate_matrix: Candidate embeddings, one row per candidate
             top_k: Number of documents to select
             lambda_param: Balance between relevance and diversity (0 to 1)
 
@@ -300,64 +570,27 @@ class HybridRetriever:
         if not candidates:
             return []
 
-        # Start with empty selected set
-        selected = []
-        remaining = candidates.copy()
-
-        # Iteratively select top_k documents
-        for _ in range(min(top_k, len(candidates))):
-            if not remaining:
-                break
-
-            # Calculate MMR score for each remaining document
-            mmr_scores = []
-            for doc in remaining:
-                # Relevance: similarity to query
-                relevance = self._cosine_similarity(query_embedding, doc["embedding"])
-
-                # Diversity: max similarity to already selected documents
-                if selected:
-                    diversity_penalty = max(
-                        self._cosine_similarity(doc["embedding"], sel["embedding"])
-                        for sel in selected
-                    )
-                else:
-                    diversity_penalty = 0.0
-
-                # MMR score
-                mmr_score = lambda_param * relevance - (1 - lambda_param) * diversity_penalty
-                mmr_scores.append((doc, mmr_score))
-
-            # Select document with highest MMR score
-            best_doc, best_score = max(mmr_scores, key=lambda x: x[1])
-            selected.append(best_doc)
-            remaining.remove(best_doc)
-
-        return selected
-
-    @staticmethod
-    def _cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
-        """
-        Calculate cosine similarity between two vectors.
-
-        Args:
-            vec1: First vector
-            vec2: Second vector
-
-        Returns:
-            Cosine similarity score (0 to 1)
-        """
-        vec1 = np.array(vec1)
-        vec2 = np.array(vec2)
+        # Embeddings are stored unit-norm (see utils.vectors), so dot products
+        # are cosine similarities. Dequantized int8 vectors and documents
+        # ingested before normalization are not; one norm pass catches both.
+        norms = np.linalg.norm(candidate_matrix, axis=1)
+        if np.any(np.abs(norms - 1) > UNIT_NORM_TOLERANCE):
+            matrix = normalize(candidate_matrix)
+        else:
+            matrix = candidate_matrix
+        query_vector = normalize(query_embedding)
 
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
+        # Relevance to the query and all pairwise similarities, computed once
+        # (candidates are few, so the N x N matrix is only a few KB)
+        relevance = matrix @ query_vector
+        similarities = matrix @ matrix.T
 
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
+        # Largest diversity penalty each candidate can ever receive
+        off_diagonal = np.where(np.eye(len(candidates), dtype=bool), np.float32(-1), similarities)
+        max_sim_bound = off_diagonal.max(axis=1)
 
-        return float(dot_product / (norm1 * norm2))
+        order = _mmr_select(relevance, similarities, max_sim_bound, float(lambda_param), top_k)
+        return [candidates[i] for i in order]
 
 
 # Example usage
@@ -1,11 +1,17 @@
 """Utility functions for the Yuno RAG Pipeline."""
 
-from .metadata_extractor import extract_metadata_from_filename, classify_team, extract_provider_name
+from .metadata_extractor import (
+    extract_metadata_from_filename,
+    classify_team,
+    extract_provider_name,
+    extract_all_metadata
+)
 from .pdf_loader import load_pdf_with_metadata
 
 __all__ = [
     "extract_metadata_from_filename",
     "classify_team",
     "extract_provider_name",
+    "extract_all_metadata",
     "load_pdf_with_metadata"
 ]
@@ -0,0 +1,110 @@
+"""
+Text hashing utilities for near-duplicate detection.
+"""
+
+import hashlib
+import re
+from typing import List
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def collapse_whitespace(text: str) -> str:
+    """
+    Collapse every run of whitespace to a single space and trim the ends.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Text with normalized whitespace (case preserved)
+    """
+    return " ".join(text.split())
+
+
+def canonicalize(text: str) -> str:
+    """
+    Normalize a user query for exact-match cache keys.
+
+    Lowercases and collapses all whitespace, so "What is SafetyPay?" and
+    " what  is safetypay? " map to the same key. Only suitable for short
+    queries; longer prompts where case carries meaning (ticket IDs, "NOT")
+    should use collapse_whitespace.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Canonical form of the text
+    """
+    return collapse_whitespace(text.lower())
+
+
+def hash_text(text: str) -> str:
+    """
+    Hash text content for exact-duplicate detection.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Hex digest (BLAKE2b, 128-bit)
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def hash_file(file_path: str) -> str:
+    """
+    Hash a file's bytes without loading it into memory.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex digest (BLAKE2b, 128-bit)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _shingles(text: str, size: int = 3) -> List[str]:
+    """Split text into overlapping word n-grams (falls back to single words for short text)."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return words
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(text: str) -> int:
+    """
+    Compute a 64-bit SimHash fingerprint of text.
+
+    Near-duplicate texts produce fingerprints with a small Hamming distance.
+
+    Args:
+        text: Input text
+
+    Returns:
+        64-bit fingerprint as an int
+    """
+    weights = [0] * 64
+
+    for shingle in _shingles(text):
+        digest = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if digest >> bit & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two fingerprints."""
+    return (a ^ b).bit_count()
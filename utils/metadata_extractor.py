@@ -3,9 +3,25 @@ Metadata extraction utilities for Jira and Confluence documents.
 """
 
 import re
+from collections import Counter
+from functools import lru_cache
 from typing import Dict, Optional
-from openai import OpenAI
-from config import OPENAI_API_KEY, GENERATION_MODEL, TEAM_PATTERNS
+from config import (
+    GENERATION_MODEL,
+    TEAM_PATTERNS,
+    TEAM_PREFIX_RE,
+    KNOWN_PROVIDERS,
+    PROVIDER_ALIASES,
+    PAYMENT_METHODS
+)
+
+
+# Jira ticket pattern: PREFIX-NUMBER (e.g., AP-541, CORECM-13628, TST12-1599),
+# where the prefix can contain letters AND numbers (e.g., TST12); otherwise
+# Confluence pattern: PAGE_ID_PAGE_ID (e.g., 3702794_3702794.pdf)
+_FILENAME_RE = re.compile(
+    r'^(?:(?P<jira_prefix>[A-Z0-9]+)-(?P<jira_number>\d+)|(?P<page_id>\d+)_\d+)'
+)
 
 
 def extract_metadata_from_filename(filename: str) -> Dict[str, Optional[str]]:
@@ -25,24 +41,18 @@ def extract_metadata_from_filename(filename: str) -> Dict[str, Optional[str]]:
         "team": None
     }
 
-    # Jira ticket pattern: PREFIX-NUMBER (e.g., AP-541, CORECM-13628, TST12-1599)
-    # Prefix can contain letters AND numbers (e.g., TST12)
-    jira_match = re.match(r'^([A-Z0-9]+)-(\d+)', filename)
-    if jira_match:
-        prefix = jira_match.group(1)
-        ticket_number = jira_match.group(2)
-        metadata["document_type"] = "jira"
-        metadata["source_id"] = f"{prefix}-{ticket_number}"
-        metadata["team"] = classify_team(prefix)
+    match = _FILENAME_RE.match(filename)
+    if not match:
         return metadata
 
-    # Confluence pattern: PAGE_ID_PAGE_ID (e.g., 3702794_3702794.pdf)
-    confluence_match = re.match(r'^(\d+)_\d+', filename)
-    if confluence_match:
-        page_id = confluence_match.group(1)
+    prefix = match.group("jira_prefix")
+    if prefix is not None:
+        metadata["document_type"] = "jira"
+        metadata["source_id"] = f"{prefix}-{match.group('jira_number')}"
+        metadata["team"] = classify_team(prefix)
+    else:
         metadata["document_type"] = "confluence"
-        metadata["source_id"] = page_id
-        return metadata
+        metadata["source_id"] = match.group("page_id")
 
     return metadata
 
@@ -57,15 +67,59 @@ def classify_team(prefix: str) -> Optional[str]:
     Returns:
         Team name or None if not found
     """
-    for pattern, team in TEAM_PATTERNS.items():
-        if prefix.startswith(pattern):
-            return team
-    return None
+    match = TEAM_PREFIX_RE.match(prefix)
+    return TEAM_PATTERNS[match.group(1)] if match else None
+
+
+# Static instructions go first so every call shares the same prompt prefix;
+# OpenAI caches repeated prefixes automatically (no request flag needed)
+_PROVIDER_SYSTEM_PROMPT = """You analyze documents and extract the payment provider name if present.
+
+Common payment providers include: SafetyPay, Stripe, Adyen, MercadoPago, PayPal, dLocal, PayU, Kushki, etc.
+Payment methods such as PIX, SPEI, PSE, OXXO or Boleto are not providers; never return them.
+
+Return ONLY the provider name if found, or "NONE" if no provider is mentioned.
+Examples of good responses: "SafetyPay", "MercadoPago", "NONE"
+"""
+
+
+# Lowercased name or alias -> canonical provider name
+_PROVIDER_CANONICAL = {
+    **{name.lower(): name for name in KNOWN_PROVIDERS},
+    **{alias.lower(): name for alias, name in PROVIDER_ALIASES.items()}
+}
+# One case-insensitive pass over the gazetteer; longer names first so
+# "Mercado Pago" wins over any shorter overlapping entry
+_PROVIDER_RE = re.compile(
+    r"\b(" + "|".join(re.escape(name) for name in sorted(_PROVIDER_CANONICAL, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+_PAYMENT_METHODS = {name.lower() for name in PAYMENT_METHODS}
+
+
+def match_known_provider(content: str) -> Optional[str]:
+    """
+    Find the most frequently mentioned known provider in content.
+
+    Args:
+        content: Text to scan
+
+    Returns:
+        Canonical provider name (ties go to the first mentioned), or None
+    """
+    mentions = Counter(_PROVIDER_CANONICAL[m.group(1).lower()] for m in _PROVIDER_RE.finditer(content))
+    return mentions.most_common(1)[0][0] if mentions else None
 
 
 def extract_provider_name(content: str, filename: str) -> Optional[str]:
     """
-    Extract provider name from document content using OpenAI.
+    Extract provider name from document content.
+
+    Providers from the KNOWN_PROVIDERS gazetteer are matched locally, first
+    in the filename and title (first line) and then by frequency in the body;
+    only documents mentioning none of them are sent to OpenAI, and those
+    results are memoized per (content, filename). Payment methods
+    (PAYMENT_METHODS) are never returned.
 
     Args:
         content: Full text content of the document
@@ -74,43 +128,101 @@ def extract_provider_name(content: str, filename: str) -> Optional[str]:
     Returns:
         Provider name or None if not found
     """
-    client = OpenAI(api_key=OPENAI_API_KEY)
-
     # Truncate content if too long (first 3000 chars should be enough)
     truncated_content = content[:3000] if len(content) > 3000 else content
 
-    prompt = f"""Analyze this document and extract the payment provider name if present.
+    # The provider a document is about is usually named in its title, while
+    # the body may mention other providers more often (comparisons, routing)
+    title = truncated_content.lstrip().split("\n", 1)[0]
+    provider = match_known_provider(f"{filename}\n{title}") or match_known_provider(truncated_content)
+    if provider:
+        return provider
+
+    try:
+        return _extract_provider_name_llm(truncated_content, filename)
+
+    except Exception as e:
+        print(f"Error extracting provider name: {e}")
+        return None
 
-Document filename: {filename}
+
+@lru_cache(maxsize=2048)
+def _extract_provider_name_llm(truncated_content: str, filename: str) -> Optional[str]:
+    """Ask the LLM for the provider name (errors propagate, so they are never cached)."""
+    # Shared HTTP/2 client: connections stay warm across documents. Imported
+    # here so that loading the extractor does not load the OpenAI SDK.
+    from llm_client import get_client
+    client = get_client()
+
+    prompt = f"""Document filename: {filename}
 Document content (beginning):
 {truncated_content}
 
-Common payment providers include: SafetyPay, Stripe, Adyen, MercadoPago, PayPal, Nequi, PIX, SPEI, PSE, etc.
+Provider name:"""
 
-Return ONLY the provider name if found, or "NONE" if no provider is mentioned.
-Examples of good responses: "SafetyPay", "MercadoPago", "NONE"
+    # Use gpt-4o-mini for faster and cheaper provider extraction
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        max_tokens=50,
+        messages=[
+            {"role": "system", "content": _PROVIDER_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    )
 
-Provider name:"""
+    provider = response.choices[0].message.content.strip()
 
-    try:
-        # Use gpt-4o-mini for faster and cheaper provider extraction
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            max_tokens=50,
-            messages=[{"role": "user", "content": prompt}]
-        )
+    # Return None if no provider found (payment methods are not providers)
+    if provider.upper() == "NONE" or not provider or provider.lower() in _PAYMENT_METHODS:
+        return None
 
-        provider = response.choices[0].message.content.strip()
+    return provider
 
-        # Return None if no provider found
-        if provider.upper() == "NONE" or not provider:
-            return None
 
-        return provider
+# Header label -> metadata field. Each extractor scans the content once with a
+# single compiled alternation. The value is captured inside a lookahead so a
+# label that appears within another field's value is still found, exactly
+# like a separate search per label.
+_JIRA_FIELDS = {
+    "Status": "status",
+    "Priority": "priority",
+    "Assignee": "assignee",
+    "Reporter": "reporter",
+    "Created": "created_date",
+    "Updated": "updated_date"
+}
+_CONFLUENCE_FIELDS = {
+    "Space": "space",
+    "Version": "version",
+    "Created By": "created_by",
+    "Created Date": "created_date"
+}
+
+
+def _compile_fields_re(labels) -> re.Pattern:
+    """Compile 'Label: value' extraction for several labels into one pattern."""
+    alternation = "|".join(re.escape(label) for label in labels)
+    return re.compile(rf'(?P<key>{alternation}):(?=\s*(?P<val>[^\n]+))')
 
-    except Exception as e:
-        print(f"Error extracting provider name: {e}")
-        return None
+
+_JIRA_FIELDS_RE = _compile_fields_re(_JIRA_FIELDS)
+_CONFLUENCE_FIELDS_RE = _compile_fields_re(_CONFLUENCE_FIELDS)
+
+
+def _extract_fields(content: str, pattern: re.Pattern, fields: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """Extract the first value of each labeled field in a single pass."""
+    metadata = dict.fromkeys(fields.values())
+    found = set()
+
+    for match in pattern.finditer(content):
+        field = fields[match.group("key")]
+        if field not in found:
+            metadata[field] = match.group("val").strip()
+            found.add(field)
+            if len(found) == len(fields):
+                break
+
+    return metadata
 
 
 def extract_jira_metadata(content: str) -> Dict[str, Optional[str]]:
@@ -123,46 +235,7 @@ def extract_jira_metadata(content: str) -> Dict[str, Optional[str]]:
     Returns:
         Dictionary with Jira-specific fields
     """
-    metadata = {
-        "status": None,
-        "priority": None,
-        "assignee": None,
-        "reporter": None,
-        "created_date": None,
-        "updated_date": None
-    }
-
-    # Extract Status
-    status_match = re.search(r'Status:\s*([^\n]+)', content)
-    if status_match:
-        metadata["status"] = status_match.group(1).strip()
-
-    # Extract Priority
-    priority_match = re.search(r'Priority:\s*([^\n]+)', content)
-    if priority_match:
-        metadata["priority"] = priority_match.group(1).strip()
-
-    # Extract Assignee
-    assignee_match = re.search(r'Assignee:\s*([^\n]+)', content)
-    if assignee_match:
-        metadata["assignee"] = assignee_match.group(1).strip()
-
-    # Extract Reporter
-    reporter_match = re.search(r'Reporter:\s*([^\n]+)', content)
-    if reporter_match:
-        metadata["reporter"] = reporter_match.group(1).strip()
-
-    # Extract Created Date
-    created_match = re.search(r'Created:\s*([^\n]+)', content)
-    if created_match:
-        metadata["created_date"] = created_match.group(1).strip()
-
-    # Extract Updated Date
-    updated_match = re.search(r'Updated:\s*([^\n]+)', content)
-    if updated_match:
-        metadata["updated_date"] = updated_match.group(1).strip()
-
-    return metadata
+    return _extract_fields(content, _JIRA_FIELDS_RE, _JIRA_FIELDS)
 
 
 def extract_confluence_metadata(content: str) -> Dict[str, Optional[str]]:
@@ -175,31 +248,42 @@ def extract_confluence_metadata(content: str) -> Dict[str, Optional[str]]:
     Returns:
         Dictionary with Confluence-specific fields
     """
-    metadata = {
-        "space": None,
-        "version": None,
-        "created_by": None,
-        "created_date": None
-    }
+    return _extract_fields(content, _CONFLUENCE_FIELDS_RE, _CONFLUENCE_FIELDS)
 
-    # Extract Space
-    space_match = re.search(r'Space:\s*([^\n]+)', content)
-    if space_match:
-        metadata["space"] = space_match.group(1).strip()
-
-    # Extract Version
-    version_match = re.search(r'Version:\s*([^\n]+)', content)
-    if version_match:
-        metadata["version"] = version_match.group(1).strip()
-
-    # Extract Created By
-    created_by_match = re.search(r'Created By:\s*([^\n]+)', content)
-    if created_by_match:
-        metadata["created_by"] = created_by_match.group(1).strip()
-
-    # Extract Created Date
-    created_date_match = re.search(r'Created Date:\s*([^\n]+)', content)
-    if created_date_match:
-        metadata["created_date"] = created_date_match.group(1).strip()
+
+def extract_all_metadata(
+    content: str,
+    filename: str,
+    document_type: Optional[str],
+    provider_content: Optional[str] = None
+) -> Dict[str, Optional[str]]:
+    """
+    Extract all content-derived metadata with at most one LLM call.
+
+    The provider name is the only LLM-extracted field; Jira and Confluence
+    header fields are parsed locally with regexes.
+
+    Args:
+        content: Leading text of the document (header fields)
+        filename: Name of the file for context
+        document_type: 'jira', 'confluence' or None
+        provider_content: Text sent to the provider LLM call (defaults to content)
+
+    Returns:
+        Dictionary with provider_name (if found) and document-type specific fields
+    """
+    metadata = {}
+
+    provider_name = extract_provider_name(
+        provider_content if provider_content is not None else content,
+        filename
+    )
+    if provider_name:
+        metadata["provider_name"] = provider_name
+
+    if document_type == "jira":
+        metadata.update(extract_jira_metadata(content))
+    elif document_type == "confluence":
+        metadata.update(extract_confluence_metadata(content))
 
     return metadata
@@ -2,32 +2,96 @@
 PDF loading utilities.
 """
 
-from typing import Dict, List
+from typing import Dict, Iterator, List
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.schema import Document
 import os
 
+from config import PDF_BACKEND
 
-def load_pdf_with_metadata(file_path: str) -> List[Document]:
+
+def iter_pdf_files(directory_path: str) -> Iterator[str]:
     """
-    Load PDF and extract text content.
+    Walk a directory tree and yield PDF file paths as they are found.
 
     Args:
-        file_path: Path to PDF file
+        directory_path: Root directory (searched recursively)
 
-    Returns:
-        List of Document objects with page content and metadata
+    Yields:
+        Paths of .pdf files (extension matched case-insensitively)
+    """
+    for dirpath, _, filenames in os.walk(directory_path):
+        for filename in filenames:
+            if filename.lower().endswith(".pdf"):
+                yield os.path.join(dirpath, filename)
+
+
+def iter_pdf_pages(file_path: str) -> Iterator[Document]:
     """
-    loader = PyPDFLoader(file_path)
-    documents = loader.load()
+    Lazily load a PDF one page at a time.
 
-    # Add filename to metadata
+    Only the current page is held in memory, so arbitrarily large PDFs can be
+    processed in bounded memory. Uses PyMuPDF when PDF_BACKEND is "pymupdf"
+    and it is installed, otherwise pypdf.
+
+    Args:
+        file_path: Path to PDF file
+
+    Yields:
+        Document objects (one per page) with page content and metadata
+    """
     filename = os.path.basename(file_path)
-    for doc in documents:
+
+    pages = None
+    if PDF_BACKEND == "pymupdf":
+        try:
+            pages = _iter_pymupdf_pages(file_path)
+        except ImportError:
+            print("pymupdf not installed, falling back to pypdf")
+
+    if pages is None:
+        pages = PyPDFLoader(file_path).lazy_load()
+
+    for doc in pages:
         doc.metadata["filename"] = filename
         doc.metadata["file_path"] = file_path
+        yield doc
+
 
-    return documents
+def _iter_pymupdf_pages(file_path: str) -> Iterator[Document]:
+    """
+    Extract page text with PyMuPDF.
+
+    PyMuPDF only decodes text operators, so pages with large vector graphics
+    streams are extracted much faster than with pypdf.
+
+    Raises:
+        ImportError: If pymupdf is not installed (raised before any page is read)
+    """
+    import fitz
+
+    def pages():
+        with fitz.open(file_path) as pdf:
+            for page in pdf:
+                yield Document(
+                    page_content=page.get_text("text"),
+                    metadata={"source": file_path, "page": page.number}
+                )
+
+    return pages()
+
+
+def load_pdf_with_metadata(file_path: str) -> List[Document]:
+    """
+    Load PDF and extract text content.
+
+    Args:
+        file_path: Path to PDF file
+
+    Returns:
+        List of Document objects with page content and metadata
+    """
+    return list(iter_pdf_pages(file_path))
 
 
 def merge_pages(documents: List[Document]) -> str:
@@ -0,0 +1,68 @@
+"""
+Client-side rate limiting for OpenAI API calls.
+
+Follows the capacity-tracking approach of OpenAI's parallel request processor:
+request and token capacity replenish continuously up to the per-minute quota,
+and callers wait until enough capacity is available before sending.
+"""
+
+import threading
+import time
+
+from config import OPENAI_TPM, OPENAI_RPM
+
+
+class TokenBucket:
+    """Thread-safe token bucket for request and token per-minute quotas."""
+
+    def __init__(self, tokens_per_minute: int, requests_per_minute: int):
+        """
+        Initialize the bucket with full capacity.
+
+        Args:
+            tokens_per_minute: Token quota (0 or less disables token throttling)
+            requests_per_minute: Request quota (0 or less disables request throttling)
+        """
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self._token_capacity = float(tokens_per_minute)
+        self._request_capacity = float(requests_per_minute)
+        self._last_update = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, n_tokens: int) -> float:
+        """
+        Reserve capacity for one request and return how long to wait before sending it.
+
+        Capacity may go negative; the deficit is the time later callers must wait,
+        so concurrent callers are spaced out instead of all retrying at once.
+        """
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_update
+            self._last_update = now
+
+            wait = 0.0
+            if self.tokens_per_minute > 0:
+                rate = self.tokens_per_minute / 60
+                self._token_capacity = min(self.tokens_per_minute, self._token_capacity + elapsed * rate)
+                self._token_capacity -= n_tokens
+                wait = max(wait, -self._token_capacity / rate)
+
+            if self.requests_per_minute > 0:
+                rate = self.requests_per_minute / 60
+                self._request_capacity = min(self.requests_per_minute, self._request_capacity + elapsed * rate)
+                self._request_capacity -= 1
+                wait = max(wait, -self._request_capacity / rate)
+
+            return wait
+
+    def acquire(self, n_tokens: int = 0):
+        """Block until capacity for one request of n_tokens is available."""
+        wait = self._reserve(n_tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+
+# Shared by every embedding call in the process (all threads)
+embedding_rate_limiter = TokenBucket(OPENAI_TPM, OPENAI_RPM)
@@ -0,0 +1,54 @@
+"""
+Retry utilities for OpenAI API calls.
+"""
+
+import random
+import time
+from typing import Callable, TypeVar
+
+from openai import APIConnectionError, APITimeoutError, RateLimitError
+
+from config import OPENAI_MAX_ATTEMPTS
+
+T = TypeVar("T")
+
+# Errors that are worth retrying: throttling and transient network failures
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """
+    Compute an exponential backoff delay with full jitter.
+
+    Args:
+        attempt: Zero-based attempt number
+        base: Delay for the first retry in seconds
+        cap: Maximum delay in seconds
+
+    Returns:
+        Delay in seconds
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def call_with_backoff(fn: Callable[..., T], *args, max_attempts: int = OPENAI_MAX_ATTEMPTS, **kwargs) -> T:
+    """
+    Call fn, retrying rate-limit and connection errors with exponential backoff.
+
+    Args:
+        fn: Function to call
+        *args: Positional arguments for fn
+        max_attempts: Maximum number of attempts before re-raising
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        Return value of fn
+    """
+    for attempt in range(max_attempts):
+        try:
+            return fn(*args, **kwargs)
+        except RETRYABLE_ERRORS:
+            if attempt == max_attempts - 1:
+                raise
+            time.sleep(backoff_delay(attempt))
+
@@ -0,0 +1,96 @@
+"""
+Materialized document counters.
+
+The document processor increments counters in the stats collection on every
+ingest (see DocumentProcessor._update_stats). Each counter counts chunks:
+"total", "type:<document_type>", and for Jira tickets "team:<team>",
+"provider:<provider_name>" and "prefix:<ticket prefix>".
+
+Counters are only trusted while "total" matches the number of documents in the
+collection. Data ingested before the counters existed (or by another tool)
+makes them disagree, and they are then rebuilt from the documents.
+"""
+
+from typing import Dict
+
+from pymongo import ReplaceOne
+from pymongo.collection import Collection
+
+
+def rebuild_counters(collection: Collection, stats_collection: Collection) -> Dict[str, int]:
+    """
+    Recompute every counter from the documents in one $facet aggregation.
+
+    Args:
+        collection: Document chunks collection
+        stats_collection: Collection holding the counters
+
+    Returns:
+        Dictionary of counter name to count
+    """
+    jira = {"metadata.document_type": "jira"}
+    result = next(collection.aggregate([{"$facet": {
+        "total": [{"$count": "count"}],
+        "type": [
+            {"$match": {"metadata.document_type": {"$ne": None}}},
+            {"$group": {"_id": "$metadata.document_type", "count": {"$sum": 1}}}
+        ],
+        "team": [
+            {"$match": {**jira, "metadata.team": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$metadata.team", "count": {"$sum": 1}}}
+        ],
+        "provider": [
+            {"$match": {**jira, "metadata.provider_name": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$metadata.provider_name", "count": {"$sum": 1}}}
+        ],
+        "prefix": [
+            {"$match": {**jira, "metadata.source_id": {"$nin": [None, ""]}}},
+            # Ticket prefixes never contain "-" (see extract_metadata_from_filename)
+            {"$group": {
+                "_id": {"$arrayElemAt": [{"$split": ["$metadata.source_id", "-"]}, 0]},
+                "count": {"$sum": 1}
+            }}
+        ]
+    }}]))
+
+    counters = {"total": result["total"][0]["count"] if result["total"] else 0}
+    for namespace in ("type", "team", "provider", "prefix"):
+        counters.update({f"{namespace}:{item['_id']}": item["count"] for item in result[namespace]})
+
+    stats_collection.bulk_write(
+        [ReplaceOne({"_id": key}, {"count": count}, upsert=True) for key, count in counters.items()]
+    )
+    stats_collection.delete_many({"_id": {"$nin": list(counters)}})
+    return counters
+
+
+def load_counters(collection: Collection, stats_collection: Collection) -> Dict[str, int]:
+    """
+    Read the counters, rebuilding them first if they are missing or out of date.
+
+    Args:
+        collection: Document chunks collection
+        stats_collection: Collection holding the counters
+
+    Returns:
+        Dictionary of counter name to count
+    """
+    counters = {doc["_id"]: doc["count"] for doc in stats_collection.find({})}
+    if counters.get("total", 0) != collection.estimated_document_count():
+        counters = rebuild_counters(collection, stats_collection)
+    return counters
+
+
+def counters_in(counters: Dict[str, int], namespace: str) -> Dict[str, int]:
+    """
+    Select the counters of one namespace.
+
+    Args:
+        counters: All counters (see load_counters)
+        namespace: Counter namespace without the colon (e.g., "team")
+
+    Returns:
+        Dictionary of counter name (without namespace) to count
+    """
+    prefix = f"{namespace}:"
+    return {key[len(prefix):]: count for key, count in counters.items() if key.startswith(prefix)}
@@ -0,0 +1,100 @@
+"""
+Token counting and token-budget utilities.
+"""
+
+from functools import lru_cache
+from typing import Dict, List
+
+import tiktoken
+
+from config import GENERATION_MODEL
+
+
+@lru_cache(maxsize=1)
+def _encoder() -> tiktoken.Encoding:
+    """
+    Return the generation model's tokenizer.
+
+    Building an encoder is expensive (and may download the BPE file), so it
+    is built once, on first use rather than at import time.
+    """
+    try:
+        return tiktoken.encoding_for_model(GENERATION_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in text using the generation model's tokenizer.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Number of tokens
+    """
+    return len(_encoder().encode(text, disallowed_special=()))
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    """
+    Count tokens for many texts at once.
+
+    Uses tiktoken's encode_batch, which encodes the texts in parallel threads.
+
+    Args:
+        texts: Input texts
+
+    Returns:
+        Number of tokens of each text, in order
+    """
+    return [len(tokens) for tokens in _encoder().encode_batch(texts, disallowed_special=())]
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Truncate text to at most max_tokens tokens.
+
+    Args:
+        text: Input text
+        max_tokens: Maximum number of tokens to keep
+
+    Returns:
+        Truncated text (unchanged if already within budget)
+    """
+    tokens = _encoder().encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return _encoder().decode(tokens[:max_tokens])
+
+
+def pack_documents(docs: List[Dict], max_tokens: int) -> List[Dict]:
+    """
+    Greedily keep whole documents, in order, until the token budget is used.
+
+    Documents are never cut mid-way, except when the first document alone
+    exceeds the budget. In that case it is truncated so the result is never empty.
+
+    Args:
+        docs: Documents with a 'content' field, in priority order
+        max_tokens: Token budget for the combined content
+
+    Returns:
+        Leading documents that fit within the budget
+    """
+    packed = []
+    used = 0
+
+    for doc in docs:
+        n_tokens = count_tokens(doc["content"])
+
+        if used + n_tokens > max_tokens:
+            if not packed:
+                packed.append({**doc, "content": truncate_to_tokens(doc["content"], max_tokens)})
+            break
+
+        packed.append(doc)
+        used += n_tokens
+
+    return packed
@@ -0,0 +1,128 @@
+"""
+Embedding storage encoding.
+
+Embeddings are L2-normalized before they are stored, so retrieval can use
+plain dot products as cosine similarities.
+
+With EMBEDDING_STORAGE="float32" embeddings are stored as BSON float32 vectors
+(4 bytes per dimension instead of 8-byte doubles), halving storage and the
+bytes returned when search results include embeddings.
+
+With EMBEDDING_STORAGE="int8" each embedding is quantized with a per-vector
+scale (max |x| / 127) and stored as a BSON int8 vector, which Atlas Vector
+Search indexes natively. Cosine similarity is scale-invariant, so search works
+on the raw int8 values; the scale is kept to approximately restore the floats.
+"""
+
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from bson.binary import Binary, BinaryVectorDtype
+
+from config import EMBEDDING_STORAGE
+
+
+def normalize(embedding: Union[List[float], np.ndarray]) -> np.ndarray:
+    """
+    Scale a vector, or each row of a matrix, to unit L2 norm.
+
+    Args:
+        embedding: Float vector or matrix
+
+    Returns:
+        Float32 array of the same shape; all-zero vectors stay zero
+    """
+    array = np.asarray(embedding, dtype=np.float32)
+    norms = np.linalg.norm(array, axis=-1, keepdims=True)
+    return array / np.where(norms == 0, 1, norms)
+
+
+def quantize_int8(embedding: List[float]) -> Tuple[np.ndarray, float]:
+    """
+    Symmetrically quantize a vector to int8.
+
+    Args:
+        embedding: Float vector
+
+    Returns:
+        (int8 array, scale) such that array * scale approximates embedding
+    """
+    array = np.asarray(embedding, dtype=np.float32)
+    scale = float(np.abs(array).max()) / 127 or 1.0
+    return np.round(array / scale).astype(np.int8), scale
+
+
+def encode_embedding(embedding: List[float]) -> Dict:
+    """
+    Build the embedding fields of a document for the configured storage format.
+
+    Args:
+        embedding: Float vector
+
+    Returns:
+        Fields to merge into the document ("embedding", plus "embedding_scale" for int8)
+    """
+    embedding = normalize(embedding)
+
+    if EMBEDDING_STORAGE == "int8":
+        quantized, scale = quantize_int8(embedding)
+        return {
+            "embedding": Binary.from_vector(quantized.tolist(), BinaryVectorDtype.INT8),
+            "embedding_scale": scale
+        }
+
+    if EMBEDDING_STORAGE == "float32":
+        return {"embedding": Binary.from_vector(embedding.tolist(), BinaryVectorDtype.FLOAT32)}
+
+    return {"embedding": embedding.tolist()}
+
+
+def encode_query_vector(embedding: List[float]) -> Union[List[float], Binary]:
+    """
+    Encode a query vector in the same format as the stored embeddings.
+
+    Args:
+        embedding: Float query vector
+
+    Returns:
+        Value for $vectorSearch.queryVector (float32 indexes accept a plain array)
+    """
+    if EMBEDDING_STORAGE == "int8":
+        quantized, _ = quantize_int8(embedding)
+        return Binary.from_vector(quantized.tolist(), BinaryVectorDtype.INT8)
+
+    return embedding
+
+
+# BSON vector dtype byte -> element type of the data after the 2-byte header
+# (dtype, padding); packed-bit vectors go through Binary.as_vector()
+_BSON_VECTOR_ELEMENTS = {
+    BinaryVectorDtype.INT8.value: np.int8,
+    BinaryVectorDtype.FLOAT32.value: np.dtype("<f4")
+}
+
+
+def decode_embedding(value: Union[List[float], Binary, None], scale: Optional[float] = None) -> Optional[np.ndarray]:
+    """
+    Decode a stored embedding to a float32 array.
+
+    Args:
+        value: Stored embedding (float array or BSON vector)
+        scale: Per-vector scale stored with int8 embeddings
+
+    Returns:
+        Float32 array, or None if value is None
+    """
+    if value is None:
+        return None
+
+    if isinstance(value, Binary):
+        element = _BSON_VECTOR_ELEMENTS.get(value[:1])
+        if element is not None:
+            # Read the raw bytes directly instead of building a Python list
+            array = np.frombuffer(value, dtype=element, offset=2).astype(np.float32)
+        else:
+            array = np.asarray(value.as_vector().data, dtype=np.float32)
+        return array * scale if scale else array
+
+    return np.asarray(value, dtype=np.float32)